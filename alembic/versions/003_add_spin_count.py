@@ -0,0 +1,20 @@
+"""Add spin count to spin sessions
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('spin_sessions', sa.Column('spin_count', sa.Integer(), server_default='1', nullable=False))
+
+def downgrade() -> None:
+    op.drop_column('spin_sessions', 'spin_count')
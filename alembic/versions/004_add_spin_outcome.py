@@ -0,0 +1,24 @@
+"""Store precomputed spin outcomes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('spin_sessions', sa.Column('result_gift_ids', sa.JSON(), nullable=True))
+    op.add_column('spin_sessions', sa.Column('server_seed', sa.String(length=64), nullable=True))
+    op.add_column('spin_sessions', sa.Column('seed_hash', sa.String(length=64), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('spin_sessions', 'seed_hash')
+    op.drop_column('spin_sessions', 'server_seed')
+    op.drop_column('spin_sessions', 'result_gift_ids')
@@ -0,0 +1,20 @@
+"""Add limited stock to gifts
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('gifts', sa.Column('stock', sa.Integer(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('gifts', 'stock')
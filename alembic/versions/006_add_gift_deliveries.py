@@ -0,0 +1,36 @@
+"""Add gift delivery queue
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('gift_deliveries',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('won_gift_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('telegram_gift_id', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=50), server_default='pending', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['won_gift_id'], ['won_gifts.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('won_gift_id')
+    )
+    op.create_index('ix_gift_deliveries_status_next_attempt_at', 'gift_deliveries', ['status', 'next_attempt_at'])
+
+def downgrade() -> None:
+    op.drop_index('ix_gift_deliveries_status_next_attempt_at', table_name='gift_deliveries')
+    op.drop_table('gift_deliveries')
@@ -0,0 +1,42 @@
+"""Add spin session indexes and archive table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # spin_sessions can be large; build the indexes without blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_spin_sessions_status_expires_at', 'spin_sessions', ['status', 'expires_at'], postgresql_concurrently=True)
+        op.create_index('ix_spin_sessions_user_id', 'spin_sessions', ['user_id'], postgresql_concurrently=True)
+    
+    op.create_table('spin_sessions_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('session_id', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('spin_count', sa.Integer(), nullable=False),
+        sa.Column('result_gift_id', sa.Integer(), nullable=True),
+        sa.Column('result_gift_ids', sa.JSON(), nullable=True),
+        sa.Column('server_seed', sa.String(length=64), nullable=True),
+        sa.Column('seed_hash', sa.String(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+def downgrade() -> None:
+    op.drop_table('spin_sessions_archive')
+    op.drop_index('ix_spin_sessions_user_id', table_name='spin_sessions')
+    op.drop_index('ix_spin_sessions_status_expires_at', table_name='spin_sessions')
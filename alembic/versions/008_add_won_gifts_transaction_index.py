@@ -0,0 +1,22 @@
+"""Add won_gifts transaction_id index
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Lets reconciliation stream WonGift counts in transaction order without a sort
+    with op.get_context().autocommit_block():
+        op.create_index('ix_won_gifts_transaction_id', 'won_gifts', ['transaction_id'], postgresql_concurrently=True)
+
+def downgrade() -> None:
+    op.drop_index('ix_won_gifts_transaction_id', table_name='won_gifts')
@@ -0,0 +1,22 @@
+"""Add users (created_at, id) index
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Backs keyset pagination and the export ordering of GET /users/
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], postgresql_concurrently=True)
+
+def downgrade() -> None:
+    op.drop_index('ix_users_created_at_id', table_name='users')
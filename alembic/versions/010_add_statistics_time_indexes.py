@@ -0,0 +1,33 @@
+"""Add time indexes for statistics
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # users.created_at ranges are already served by ix_users_created_at_id (009)
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_last_activity', 'users', ['last_activity'], postgresql_concurrently=True)
+        op.create_index(
+            'ix_transactions_completed_at',
+            'transactions',
+            ['completed_at'],
+            postgresql_where=sa.text("status = 'completed'"),
+            postgresql_include=['amount'],
+            postgresql_concurrently=True
+        )
+        op.create_index('ix_won_gifts_won_at', 'won_gifts', ['won_at'], postgresql_concurrently=True)
+
+def downgrade() -> None:
+    op.drop_index('ix_won_gifts_won_at', table_name='won_gifts')
+    op.drop_index('ix_transactions_completed_at', table_name='transactions')
+    op.drop_index('ix_users_last_activity', table_name='users')
@@ -0,0 +1,52 @@
+"""Add daily statistics rollup tables
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('daily_user_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('new_users', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('daily_revenue_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('revenue', sa.BigInteger(), nullable=False),
+        sa.Column('transactions', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('daily_gift_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('gift_id', sa.Integer(), nullable=False),
+        sa.Column('wins', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['gift_id'], ['gifts.id'], ),
+        sa.PrimaryKeyConstraint('day', 'gift_id')
+    )
+    op.create_table('stats_rollup_state',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('watermark', sa.Date(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_premium', 'users', ['id'], postgresql_where=sa.text('is_premium = true'), postgresql_concurrently=True)
+        op.create_index('ix_users_blocked', 'users', ['id'], postgresql_where=sa.text('is_blocked = true'), postgresql_concurrently=True)
+
+def downgrade() -> None:
+    op.drop_index('ix_users_blocked', table_name='users')
+    op.drop_index('ix_users_premium', table_name='users')
+    op.drop_table('stats_rollup_state')
+    op.drop_table('daily_gift_stats')
+    op.drop_table('daily_revenue_stats')
+    op.drop_table('daily_user_stats')
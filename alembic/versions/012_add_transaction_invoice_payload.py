@@ -0,0 +1,28 @@
+"""Add invoice_payload to transactions
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('invoice_payload', sa.String(length=255), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_user_id_invoice_payload',
+            'transactions',
+            ['user_id', 'invoice_payload'],
+            postgresql_concurrently=True
+        )
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_user_id_invoice_payload', table_name='transactions')
+    op.drop_column('transactions', 'invoice_payload')
@@ -0,0 +1,20 @@
+"""Add lease_owner to gift_deliveries
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('gift_deliveries', sa.Column('lease_owner', sa.String(length=64), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('gift_deliveries', 'lease_owner')
@@ -1,44 +1,106 @@
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, status, Header, Request
+from aiogram import Bot
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import LRUCache
+from app.core.config import settings
 from app.core.database import get_session
 from app.bot.utils.auth import verify_telegram_auth
+from app.models.database import User
+from app.services.admin_registry import admin_registry
 from app.services.user import UserService
 from typing import Dict, Optional
+import orjson
 
-async def get_current_user(
-    init_data: str = Header(..., alias="X-Init-Data"),
-    session: AsyncSession = Depends(get_session)
-) -> Dict:
-    auth_data = verify_telegram_auth(init_data)
-    
-    if not auth_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication data"
-        )
-    
-    user_service = UserService(session)
+# telegram_id -> User, so back-to-back mini app calls don't re-query the user
+_user_cache = LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+def parse_user_data(auth_data: Dict) -> Dict:
     try:
-        user_data = eval(auth_data.get('user', '{}'))
-        telegram_id = user_data.get('id')
-    except:
+        user_data = orjson.loads(auth_data.get('user', '{}'))
+    except orjson.JSONDecodeError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid user data"
         )
-    
-    if not telegram_id:
+
+    if not isinstance(user_data, dict) or not user_data.get('id'):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User ID not found"
         )
-    
-    user = await user_service.get_user_by_telegram_id(telegram_id)
-    
-    if not user:
+    return user_data
+
+async def read_init_data(request: Request, header_value: Optional[str]) -> Optional[str]:
+    if header_value:
+        return header_value
+
+    # POST /roulette/spin carries init_data in its JSON body; FastAPI has already read and cached it
+    if request.method == "POST":
+        try:
+            body = await request.json()
+        except Exception:
+            return None
+        if isinstance(body, dict) and isinstance(body.get('init_data'), str):
+            return body['init_data']
+    return None
+
+async def get_current_user(
+    request: Request,
+    init_data: Optional[str] = Header(None, alias="X-Init-Data"),
+    session: AsyncSession = Depends(get_session)
+) -> User:
+    """The authenticated mini app user.
+
+    init_data comes from the X-Init-Data header (or a JSON body's
+    ``init_data``). The user is resolved at most once per request and
+    reused from a short-TTL cache across requests.
+    """
+    current_user = getattr(request.state, "current_user", None)
+    if current_user is not None:
+        return current_user
+
+    init_data = await read_init_data(request, init_data)
+    auth_data = verify_telegram_auth(init_data) if init_data else None
+    if not auth_data:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication data"
+        )
+
+    telegram_id = parse_user_data(auth_data)['id']
+
+    user = _user_cache.get(telegram_id)
+    if user is None:
+        user_service = UserService(session)
+        user = await user_service.get_user_by_telegram_id(telegram_id)
+
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        _user_cache.set(telegram_id, user)
+
+    request.state.auth_data = auth_data
+    request.state.current_user = user
+    return user
+
+async def get_current_admin(user: User = Depends(get_current_user)) -> User:
+    """The authenticated mini app user, who must be an admin in the admin registry"""
+    await admin_registry.ensure_loaded()
+    if not admin_registry.is_admin(user.telegram_id, user.username):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user
+
+def get_bot(request: Request) -> Bot:
+    """The running bot, which the API needs for anything that calls Telegram"""
+    bot = getattr(request.app.state, "bot", None)
+    if bot is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Bot is not running"
         )
-    
-    return {"user": user, "auth_data": auth_data}
+    return bot
@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response, Request, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from aiogram import Bot
+from aiogram.types import LabeledPrice
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from app.core.database import get_session
-from app.api.dependencies import get_current_user
+from app.core.database import get_session, async_session_maker
+from app.core.pubsub import pubsub
+from app.api.dependencies import get_current_user, get_bot
+from app.models.database import User
 from app.services.gift import GiftService
-from app.services.payment import PaymentService
+from app.services.gift_catalog import gift_catalog
+from app.services.payment import PaymentService, SoldOutError, spin_session_channel
 from app.core.config import settings
-from typing import List, Dict
+from typing import List, Dict, Optional
+import asyncio
+import json
+import time
 
 router = APIRouter(prefix="/roulette", tags=["roulette"])
 
+FINAL_SPIN_SESSION_STATUSES = {"completed", "expired"}
+
 class GiftResponse(BaseModel):
     id: int
     gift_id: str
@@ -19,11 +31,16 @@ class GiftResponse(BaseModel):
     image_url: str
 
 class SpinRequest(BaseModel):
-    init_data: str
+    # Optional when the X-Init-Data header is sent instead
+    init_data: Optional[str] = None
+    spins: int = 1
 
 class SpinResponse(BaseModel):
     session_id: str
     invoice_link: str
+    spins: int
+    total_cost: int
+    seed_hash: str
 
 class ProfileResponse(BaseModel):
     user_id: int
@@ -32,99 +49,79 @@ class ProfileResponse(BaseModel):
 
 @router.get("/gifts", response_model=List[GiftResponse])
 async def get_available_gifts(
-    session: AsyncSession = Depends(get_session)
+    if_none_match: Optional[str] = Header(None)
 ):
-    gift_service = GiftService(session)
-    gifts = await gift_service.get_available_gifts()
+    # Served from the in-memory catalog; no DB session unless it needs a rebuild
+    payload, etag = await gift_catalog.get()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
     
-    return [
-        GiftResponse(
-            id=gift.id,
-            gift_id=gift.gift_id,
-            name=gift.name,
-            description=gift.description or "",
-            star_count=gift.star_count,
-            image_url=gift.image_url or ""
-        )
-        for gift in gifts
-    ]
+    if gift_catalog.etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+async def create_spin_invoice_link(bot: Bot, session_id: str, spins: int) -> str:
+    """Stars invoice for a spin pack; its payload is the session id settlement claims"""
+    title = "Roulette spin" if spins == 1 else f"{spins} roulette spins"
+    return await bot.create_invoice_link(
+        title=title,
+        description=f"{title} for a chance to win a Telegram gift",
+        payload=session_id,
+        provider_token="",  # empty for payments in Telegram Stars
+        currency="XTR",
+        prices=[LabeledPrice(label=title, amount=spins * settings.SPIN_COST)]
+    )
 
 @router.post("/spin", response_model=SpinResponse)
 async def create_spin_session(
     request: SpinRequest,
+    user: User = Depends(get_current_user),
+    bot: Bot = Depends(get_bot),
     session: AsyncSession = Depends(get_session)
 ):
-    from app.bot.utils.auth import verify_telegram_auth
-    from app.services.user import UserService
-    
-    auth_data = verify_telegram_auth(request.init_data)
-    if not auth_data:
+    if request.spins not in settings.SPIN_PACKS:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication data"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Spins must be one of {settings.SPIN_PACKS}"
         )
     
+    payment_service = PaymentService(session)
     try:
-        user_data = eval(auth_data.get('user', '{}'))
-        telegram_id = user_data.get('id')
-    except:
+        spin_session = await payment_service.create_spin_session(user.telegram_id, request.spins)
+    except SoldOutError as e:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid user data"
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
         )
-    
-    user_service = UserService(session)
-    user = await user_service.get_user_by_telegram_id(telegram_id)
-    
-    if not user:
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
         )
     
-    payment_service = PaymentService(session)
-    spin_session = await payment_service.create_spin_session(user.telegram_id)
-    
-    invoice_link = f"https://t.me/{settings.BOT_TOKEN.split(':')[0]}/invoice"
+    try:
+        invoice_link = await create_spin_invoice_link(bot, spin_session.session_id, spin_session.spin_count)
+    except Exception as e:
+        print(f"Error creating invoice link: {e}")
+        await payment_service.cancel_spin_session(spin_session.session_id)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Could not create the invoice, please try again"
+        )
     
     return SpinResponse(
         session_id=spin_session.session_id,
-        invoice_link=invoice_link
+        invoice_link=invoice_link,
+        spins=spin_session.spin_count,
+        total_cost=spin_session.spin_count * settings.SPIN_COST,
+        seed_hash=spin_session.seed_hash
     )
 
 @router.get("/profile", response_model=ProfileResponse)
 async def get_user_profile(
-    init_data: str = Header(..., alias="X-Init-Data"),
+    user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session)
 ):
-    from app.bot.utils.auth import verify_telegram_auth
-    from app.services.user import UserService
-    
-    auth_data = verify_telegram_auth(init_data)
-    if not auth_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication data"
-        )
-    
-    try:
-        user_data = eval(auth_data.get('user', '{}'))
-        telegram_id = user_data.get('id')
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid user data"
-        )
-    
-    user_service = UserService(session)
-    user = await user_service.get_user_by_telegram_id(telegram_id)
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     gift_service = GiftService(session)
     won_gifts = await gift_service.get_user_won_gifts(user.telegram_id)
     
@@ -147,23 +144,95 @@ async def get_user_profile(
         won_gifts=gift_responses
     )
 
+async def load_spin_session_status(session_id: str) -> Optional[Dict]:
+    # Own short-lived session, so the connection is back in the pool before any waiting
+    async with async_session_maker() as session:
+        payment_service = PaymentService(session)
+        spin_session = await payment_service.get_spin_session(session_id)
+    
+    if not spin_session:
+        return None
+    
+    response = {
+        "session_id": spin_session.session_id,
+        "status": spin_session.status,
+        "spins": spin_session.spin_count,
+        "seed_hash": spin_session.seed_hash,
+        "created_at": spin_session.created_at,
+        "expires_at": spin_session.expires_at
+    }
+    
+    # Revealing the outcome before payment would let users cancel losing spins
+    if spin_session.status == "completed":
+        response["result_gift_ids"] = spin_session.result_gift_ids
+        response["server_seed"] = spin_session.server_seed
+    
+    return response
+
 @router.get("/session/{session_id}")
 async def get_spin_session_status(
     session_id: str,
-    session: AsyncSession = Depends(get_session)
+    wait: float = Query(0, ge=0, le=settings.SPIN_SESSION_LONG_POLL_TIMEOUT)
 ):
-    payment_service = PaymentService(session)
-    spin_session = await payment_service.get_spin_session(session_id)
-    
-    if not spin_session:
+    """Spin session status; with ``wait`` it long-polls until the status changes"""
+    # Subscribe before reading so an update published in between isn't missed
+    async with pubsub.subscribe(spin_session_channel(session_id)) as updates:
+        response = await load_spin_session_status(session_id)
+        
+        if not response:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found"
+            )
+        
+        if wait and response["status"] not in FINAL_SPIN_SESSION_STATUSES:
+            try:
+                response.update(await asyncio.wait_for(updates.get(), timeout=wait))
+            except asyncio.TimeoutError:
+                pass
+    
+    return response
+
+@router.get("/session/{session_id}/events")
+async def stream_spin_session_status(session_id: str, request: Request):
+    """Server-Sent Events stream of spin session status updates"""
+    if not await load_spin_session_status(session_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    return {
-        "session_id": spin_session.session_id,
-        "status": spin_session.status,
-        "created_at": spin_session.created_at,
-        "expires_at": spin_session.expires_at
-    }
+    def format_event(data: Dict) -> str:
+        return f"event: status\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+    
+    async def event_stream():
+        # Subscribed for exactly as long as the stream runs, and before the
+        # status read so an update published in between isn't missed
+        async with pubsub.subscribe(spin_session_channel(session_id)) as updates:
+            response = await load_spin_session_status(session_id)
+            if not response:
+                return
+            
+            yield format_event(response)
+            if response["status"] in FINAL_SPIN_SESSION_STATUSES:
+                return
+            
+            deadline = time.monotonic() + settings.SPIN_SESSION_STREAM_TIMEOUT
+            while time.monotonic() < deadline:
+                try:
+                    update = await asyncio.wait_for(updates.get(), timeout=settings.SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                yield format_event(update)
+                if update.get("status") in FINAL_SPIN_SESSION_STATUSES:
+                    return
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
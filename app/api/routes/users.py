@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from app.core.database import get_session
-from app.services.user import UserService
-from app.bot.utils.auth import get_user_from_init_data
+from app.core.database import get_session, async_session_maker
+from app.services.user import UserService, USER_EXPORT_COLUMNS, encode_cursor, decode_cursor
+from app.services.statistics import StatisticsService
+from app.api.dependencies import get_current_user, get_current_admin
+from app.models.database import User
 from typing import List, Optional
 from datetime import datetime
+import csv
+import io
+import json
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+EXPORT_FLUSH_ROWS = 500
+EXPORT_FLUSH_BYTES = 64 * 1024
+
 class UserResponse(BaseModel):
     telegram_id: int
     username: Optional[str]
@@ -26,28 +36,12 @@ class UserAnalytics(BaseModel):
     premium_users: int
     active_users_today: int
     blocked_users: int
+    new_users_today: int = 0
+    new_users_week: int = 0
+    new_users_month: int = 0
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(
-    x_init_data: str = Header(..., alias="X-Init-Data"),
-    session: AsyncSession = Depends(get_session)
-):
-    user_data = get_user_from_init_data(x_init_data)
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication data"
-        )
-    
-    user_service = UserService(session)
-    user = await user_service.get_user_by_telegram_id(user_data['id'])
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
+async def get_me(user: User = Depends(get_current_user)):
     return UserResponse(
         telegram_id=user.telegram_id,
         username=user.username,
@@ -63,27 +57,39 @@ async def get_current_user(
 
 @router.get("/analytics", response_model=UserAnalytics)
 async def get_user_analytics(
-    session: AsyncSession = Depends(get_session)
+    session: AsyncSession = Depends(get_session),
+    admin: User = Depends(get_current_admin)
 ):
-    user_service = UserService(session)
+    stats_service = StatisticsService(session)
+    stats = await stats_service.get_user_stats()
     
-    total_users = await user_service.get_user_count()
-    
-    return UserAnalytics(
-        total_users=total_users,
-        premium_users=0,
-        active_users_today=0,
-        blocked_users=0
-    )
+    return UserAnalytics(**stats)
 
 @router.get("/", response_model=List[UserResponse])
 async def get_all_users(
-    limit: int = 100,
-    offset: int = 0,
-    session: AsyncSession = Depends(get_session)
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0, deprecated=True),
+    session: AsyncSession = Depends(get_session),
+    admin: User = Depends(get_current_admin)
 ):
+    """Users, newest first. Pass the ``X-Next-Cursor`` response header back as ``cursor`` for the next page."""
     user_service = UserService(session)
-    users = await user_service.get_all_users(limit=limit, offset=offset)
+    
+    if offset and not cursor:
+        users = await user_service.get_all_users(limit=limit, offset=offset)
+    else:
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        users, next_key = await user_service.get_users_page(limit=limit, after=after)
+        if next_key:
+            response.headers["X-Next-Cursor"] = encode_cursor(next_key)
     
     return [
         UserResponse(
@@ -100,3 +106,47 @@ async def get_all_users(
         )
         for user in users
     ]
+
+@router.get("/export")
+async def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    admin: User = Depends(get_current_admin)
+):
+    """Stream every user as NDJSON or CSV in constant memory"""
+    fields = [column.key for column in USER_EXPORT_COLUMNS]
+    
+    async def export_rows():
+        # Own session for the lifetime of the stream; the cursor is server-side
+        async with async_session_maker() as session:
+            user_service = UserService(session)
+            
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(fields)
+                async for row in user_service.stream_users():
+                    writer.writerow(
+                        value.isoformat() if isinstance(value, datetime) else value
+                        for value in row
+                    )
+                    if buffer.tell() >= EXPORT_FLUSH_BYTES:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                lines = []
+                async for row in user_service.stream_users():
+                    lines.append(json.dumps(jsonable_encoder(dict(row._mapping))))
+                    if len(lines) >= EXPORT_FLUSH_ROWS:
+                        yield "\n".join(lines) + "\n"
+                        lines = []
+                if lines:
+                    yield "\n".join(lines) + "\n"
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'}
+    )
@@ -6,15 +6,19 @@ from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_session
 from app.core.config import settings
+from app.bot.middlewares.admin import AdminMiddleware
 from app.services.statistics import StatisticsService
 from app.services.broadcast import BroadcastService
 from app.services.admin_session import AdminSessionService
 from app.services.admin import AdminService
 from app.services.user import UserService
 from typing import Dict
+import asyncio
 import json
 
 router = Router()
+router.message.middleware(AdminMiddleware())
+router.callback_query.middleware(AdminMiddleware())
 
 class BroadcastStates(StatesGroup):
     waiting_for_title = State()
@@ -26,10 +30,6 @@ class BroadcastStates(StatesGroup):
 class AdminStates(StatesGroup):
     waiting_for_admin_username = State()
 
-async def is_admin(user_id: int, username: str, session: AsyncSession) -> bool:
-    admin_service = AdminService(session)
-    return await admin_service.is_admin(user_id, username)
-
 def admin_main_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -97,10 +97,6 @@ def admin_management_keyboard() -> InlineKeyboardMarkup:
 
 @router.message(Command("admin"))
 async def admin_panel(message: Message, session: AsyncSession):
-    if not await is_admin(message.from_user.id, message.from_user.username, session):
-        await message.answer("❌ Access denied. You are not authorized to use admin commands.")
-        return
-    
     await message.answer(
         "🔧 **Admin Panel**\n\n"
         "Welcome to the administration panel. Choose an option below:",
@@ -110,10 +106,6 @@ async def admin_panel(message: Message, session: AsyncSession):
 
 @router.callback_query(F.data == "admin_main")
 async def admin_main_callback(callback: CallbackQuery, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     await callback.message.edit_text(
         "🔧 **Admin Panel**\n\n"
         "Welcome to the administration panel. Choose an option below:",
@@ -123,14 +115,13 @@ async def admin_main_callback(callback: CallbackQuery, session: AsyncSession):
 
 @router.callback_query(F.data == "admin_stats")
 async def admin_stats_callback(callback: CallbackQuery, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     stats_service = StatisticsService(session)
-    user_stats = await stats_service.get_user_stats()
-    revenue_stats = await stats_service.get_revenue_stats()
-    gift_stats = await stats_service.get_gift_stats()
+    user_stats, revenue_stats, gift_stats, top_gifts = await asyncio.gather(
+        stats_service.get_user_stats(),
+        stats_service.get_revenue_stats(),
+        stats_service.get_gift_stats(),
+        stats_service.get_top_gifts()
+    )
     
     text = (
         "📊 **Statistics Overview**\n\n"
@@ -152,6 +143,10 @@ async def admin_stats_callback(callback: CallbackQuery, session: AsyncSession):
         f"• Today: {gift_stats['gifts_today']:,}\n"
         f"• Total value: {gift_stats['total_gift_value']:,} ⭐"
     )
+    if top_gifts:
+        text += "\n\n🏆 **Top gifts:**\n" + "\n".join(
+            f"• {gift['name']}: {gift['count']:,}" for gift in top_gifts
+        )
     
     await callback.message.edit_text(
         text,
@@ -161,10 +156,6 @@ async def admin_stats_callback(callback: CallbackQuery, session: AsyncSession):
 
 @router.callback_query(F.data == "stats_charts")
 async def stats_charts_callback(callback: CallbackQuery, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     await callback.answer("📊 Generating charts...", show_alert=True)
     
     stats_service = StatisticsService(session)
@@ -191,10 +182,6 @@ async def stats_charts_callback(callback: CallbackQuery, session: AsyncSession):
 
 @router.callback_query(F.data == "admin_management")
 async def admin_management_callback(callback: CallbackQuery, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     await callback.message.edit_text(
         "👑 **Admin Management**\n\n"
         "Manage bot administrators and their permissions.",
@@ -204,10 +191,6 @@ async def admin_management_callback(callback: CallbackQuery, session: AsyncSessi
 
 @router.callback_query(F.data == "add_admin")
 async def add_admin_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     await state.set_state(AdminStates.waiting_for_admin_username)
     await callback.message.edit_text(
         "➕ **Add New Admin**\n\n"
@@ -218,9 +201,6 @@ async def add_admin_callback(callback: CallbackQuery, state: FSMContext, session
 
 @router.message(AdminStates.waiting_for_admin_username)
 async def add_admin_username_handler(message: Message, state: FSMContext, session: AsyncSession):
-    if not await is_admin(message.from_user.id, message.from_user.username, session):
-        return
-    
     username = message.text.strip().replace('@', '')
     
     try:
@@ -273,10 +253,6 @@ async def add_admin_username_handler(message: Message, state: FSMContext, sessio
 
 @router.callback_query(F.data == "list_admins")
 async def list_admins_callback(callback: CallbackQuery, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     admin_service = AdminService(session)
     admins = await admin_service.get_all_admins()
     
@@ -307,10 +283,6 @@ async def list_admins_callback(callback: CallbackQuery, session: AsyncSession):
 
 @router.callback_query(F.data == "admin_broadcast")
 async def admin_broadcast_callback(callback: CallbackQuery, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     await callback.message.edit_text(
         "📢 **Broadcast Management**\n\n"
         "Create and manage broadcast messages to all users.",
@@ -320,10 +292,6 @@ async def admin_broadcast_callback(callback: CallbackQuery, session: AsyncSessio
 
 @router.callback_query(F.data == "broadcast_new")
 async def broadcast_new_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     await state.set_state(BroadcastStates.waiting_for_title)
     await callback.message.edit_text(
         "📝 **Create New Broadcast**\n\n"
@@ -333,9 +301,6 @@ async def broadcast_new_callback(callback: CallbackQuery, state: FSMContext, ses
 
 @router.message(BroadcastStates.waiting_for_title)
 async def broadcast_title_handler(message: Message, state: FSMContext, session: AsyncSession):
-    if not await is_admin(message.from_user.id, message.from_user.username, session):
-        return
-    
     await state.update_data(title=message.text)
     await state.set_state(BroadcastStates.waiting_for_image)
     
@@ -361,10 +326,6 @@ async def broadcast_title_handler(message: Message, state: FSMContext, session:
 
 @router.callback_query(F.data == "broadcast_skip_image")
 async def broadcast_skip_image_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     await state.set_state(BroadcastStates.waiting_for_text)
     await callback.message.edit_text(
         "📝 **Step 3/5: Message Text**\n\n"
@@ -379,9 +340,6 @@ async def broadcast_skip_image_callback(callback: CallbackQuery, state: FSMConte
 
 @router.message(BroadcastStates.waiting_for_image)
 async def broadcast_image_handler(message: Message, state: FSMContext, session: AsyncSession):
-    if not await is_admin(message.from_user.id, message.from_user.username, session):
-        return
-    
     image_url = None
     if message.photo:
         image_url = message.photo[-1].file_id
@@ -413,9 +371,6 @@ async def broadcast_image_handler(message: Message, state: FSMContext, session:
 
 @router.message(BroadcastStates.waiting_for_text)
 async def broadcast_text_handler(message: Message, state: FSMContext, session: AsyncSession):
-    if not await is_admin(message.from_user.id, message.from_user.username, session):
-        return
-    
     data = await state.get_data()
     data['text'] = message.text
     await state.update_data(**data)
@@ -454,18 +409,11 @@ async def broadcast_text_handler(message: Message, state: FSMContext, session: A
 
 @router.callback_query(F.data == "broadcast_skip_keyboard")
 async def broadcast_skip_keyboard_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     data = await state.get_data()
     await show_broadcast_confirmation(callback.message, data, state, session)
 
 @router.message(BroadcastStates.waiting_for_keyboard)
 async def broadcast_keyboard_handler(message: Message, state: FSMContext, session: AsyncSession):
-    if not await is_admin(message.from_user.id, message.from_user.username, session):
-        return
-    
     try:
         keyboard_data = json.loads(message.text)
         data = await state.get_data()
@@ -515,10 +463,6 @@ async def show_broadcast_confirmation(message: Message, data: Dict, state: FSMCo
 
 @router.callback_query(F.data == "broadcast_confirm")
 async def broadcast_confirm_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     data = await state.get_data()
     
     broadcast_service = BroadcastService(session, callback.bot)
@@ -557,10 +501,6 @@ async def broadcast_confirm_callback(callback: CallbackQuery, state: FSMContext,
 
 @router.callback_query(F.data == "broadcast_cancel")
 async def broadcast_cancel_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, callback.from_user.username, session):
-        await callback.answer("❌ Access denied", show_alert=True)
-        return
-    
     await state.clear()
     
     admin_session_service = AdminSessionService(session)
@@ -1,30 +1,119 @@
 from aiogram import Router, F
 from aiogram.types import PreCheckoutQuery, Message, LabeledPrice
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.payment import PaymentService
-from app.services.gift import GiftService
+from app.services.payment import PaymentService, spin_session_channel
+from app.services.write_behind import pending_transactions
+from app.bot.utils.methods import RefundStarPayment
 from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.metrics import metrics
+from app.core.pubsub import pubsub
+from collections import Counter
+from typing import Dict, List
+import time
 
 router = Router()
 
+def is_valid_spin_purchase(pre_checkout_query: PreCheckoutQuery) -> bool:
+    return (
+        pre_checkout_query.currency == "XTR"
+        and PaymentService.spins_for_amount(pre_checkout_query.total_amount) is not None
+    )
+
 @router.pre_checkout_query()
-async def process_pre_checkout_query(
-    pre_checkout_query: PreCheckoutQuery,
-    session: AsyncSession
-):
+async def process_pre_checkout_query(pre_checkout_query: PreCheckoutQuery):
+    # Telegram cancels the payment if this isn't answered within 10 seconds
+    started = time.perf_counter()
+    
+    if settings.PRE_CHECKOUT_FAST_ACK:
+        await fast_ack_pre_checkout_query(pre_checkout_query, started)
+        return
+    
     try:
-        payment_service = PaymentService(session)
-        
-        await payment_service.create_transaction(
-            user_id=pre_checkout_query.from_user.id,
-            amount=settings.SPIN_COST,
-            transaction_id=pre_checkout_query.id
-        )
+        async with async_session_maker() as session:
+            payment_service = PaymentService(session)
+            
+            with metrics.timer("pre_checkout.db_insert"):
+                await payment_service.create_transaction(
+                    user_id=pre_checkout_query.from_user.id,
+                    amount=pre_checkout_query.total_amount,
+                    transaction_id=pre_checkout_query.id,
+                    invoice_payload=pre_checkout_query.invoice_payload
+                )
         
-        await pre_checkout_query.answer(ok=True)
+        with metrics.timer("pre_checkout.answer"):
+            await pre_checkout_query.answer(ok=True)
     except Exception as e:
         print(f"Error in pre_checkout_query: {e}")
         await pre_checkout_query.answer(ok=False, error_message="Payment processing error")
+    finally:
+        metrics.observe("pre_checkout.total", time.perf_counter() - started)
+
+async def fast_ack_pre_checkout_query(pre_checkout_query: PreCheckoutQuery, started: float):
+    """Validate in memory, answer right away and buffer the pending transaction"""
+    with metrics.timer("pre_checkout.validate"):
+        is_valid = is_valid_spin_purchase(pre_checkout_query)
+    
+    try:
+        with metrics.timer("pre_checkout.answer"):
+            if is_valid:
+                await pre_checkout_query.answer(ok=True)
+            else:
+                await pre_checkout_query.answer(ok=False, error_message="Invalid payment amount")
+        metrics.observe("pre_checkout.time_to_answer", time.perf_counter() - started)
+        
+        if is_valid:
+            with metrics.timer("pre_checkout.enqueue"):
+                await pending_transactions.enqueue(
+                    user_id=pre_checkout_query.from_user.id,
+                    transaction_id=pre_checkout_query.id,
+                    amount=pre_checkout_query.total_amount,
+                    invoice_payload=pre_checkout_query.invoice_payload
+                )
+            
+            if pre_checkout_query.invoice_payload:
+                await pubsub.publish(
+                    spin_session_channel(pre_checkout_query.invoice_payload),
+                    {"session_id": pre_checkout_query.invoice_payload, "status": "paying"}
+                )
+    except Exception as e:
+        print(f"Error in pre_checkout_query: {e}")
+    finally:
+        metrics.observe("pre_checkout.total", time.perf_counter() - started)
+
+def format_won_gifts(gifts: List[Dict]) -> str:
+    counts = Counter(gift["name"] for gift in gifts)
+    return ", ".join(
+        name if count == 1 else f"{name} x{count}"
+        for name, count in counts.items()
+    )
+
+async def refund_unsettled_payment(message: Message, payment_service: PaymentService):
+    """Give back the Stars of a payment nothing could be drawn for (gifts sold out, no such pack)"""
+    payment = message.successful_payment
+    try:
+        await message.bot(RefundStarPayment(
+            user_id=message.from_user.id,
+            telegram_payment_charge_id=payment.telegram_payment_charge_id
+        ))
+    except Exception as e:
+        # The pre-checkout row stays pending, so reconciliation reports the charge
+        print(f"Error refunding payment {payment.telegram_payment_charge_id}: {e}")
+        await message.answer(
+            "😔 Sorry, no gifts are available at the moment and we couldn't refund "
+            "your Stars automatically. Please contact support."
+        )
+        return
+    
+    await payment_service.record_refund(
+        user_id=message.from_user.id,
+        charge_id=payment.telegram_payment_charge_id,
+        amount=payment.total_amount,
+        invoice_payload=payment.invoice_payload
+    )
+    await message.answer(
+        "😔 Sorry, no gifts are available at the moment. Your Stars have been refunded."
+    )
 
 @router.message(F.successful_payment)
 async def process_successful_payment(
@@ -33,44 +122,35 @@ async def process_successful_payment(
 ):
     try:
         payment_service = PaymentService(session)
-        gift_service = GiftService(session)
         
         payment = message.successful_payment
         
-        await payment_service.update_transaction_status(
-            transaction_id=payment.telegram_payment_charge_id,
-            status="completed"
+        settlement = await payment_service.process_spin_payment(
+            user_id=message.from_user.id,
+            charge_id=payment.telegram_payment_charge_id,
+            amount=payment.total_amount,
+            invoice_payload=payment.invoice_payload
         )
         
-        won_gift = await gift_service.get_random_gift()
-        
-        if won_gift:
-            await gift_service.record_won_gift(
-                user_id=message.from_user.id,
-                gift_id=won_gift.id
-            )
-            
-            try:
-                await message.bot.send_gift(
-                    user_id=message.from_user.id,
-                    gift_id=won_gift.gift_id
-                )
-                
-                await message.answer(
-                    f"🎉 Congratulations! You won: {won_gift.name}!\n"
-                    f"The gift has been sent to you! 🎁"
-                )
-            except Exception:
+        if settlement and settlement["duplicate"]:
+            print(f"Payment {payment.telegram_payment_charge_id} was already settled")
+            if settlement.get("gifts"):
                 await message.answer(
-                    f"🎉 Congratulations! You won: {won_gift.name}!\n"
-                    f"Unfortunately, we couldn't send the gift automatically. "
-                    f"Please contact support with your transaction ID: {payment.telegram_payment_charge_id}"
+                    f"✅ This payment was already processed. You won: {format_won_gifts(settlement['gifts'])}!"
                 )
-        else:
+            return
+        
+        if settlement:
+            spin_session = settlement.get("spin_session")
+            if spin_session:
+                await pubsub.publish(spin_session_channel(spin_session["session_id"]), spin_session)
+            
             await message.answer(
-                "😔 Sorry, no gifts are available at the moment. "
-                "Your Stars will be refunded shortly."
+                f"🎉 Congratulations! You won: {format_won_gifts(settlement['gifts'])}!\n"
+                f"Your gift is on its way! 🎁"
             )
+        else:
+            await refund_unsettled_payment(message, payment_service)
     except Exception as e:
         print(f"Error processing successful payment: {e}")
         await message.answer(
@@ -13,8 +13,6 @@ async def start_handler(message: Message, session: AsyncSession):
     user_service = UserService(session)
     user = await user_service.get_or_create_user(message.from_user)
     
-    await user_service.update_last_activity(user.telegram_id)
-    
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
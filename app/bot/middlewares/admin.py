@@ -0,0 +1,28 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import Message, CallbackQuery
+from app.services.admin_registry import admin_registry
+
+class AdminMiddleware(BaseMiddleware):
+    """Lets only admins reach the handlers of the router it is registered on.
+
+    Registered as an inner middleware, so it only runs for events one of the
+    router's handlers matched; everything else keeps propagating to the
+    other routers untouched.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message | CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        await admin_registry.ensure_loaded()
+        if admin_registry.is_admin(event.from_user.id, event.from_user.username):
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            await event.answer("❌ Access denied", show_alert=True)
+        elif event.text and event.text.startswith("/"):
+            await event.answer("❌ Access denied. You are not authorized to use admin commands.")
+        return None
@@ -0,0 +1,16 @@
+import asyncio
+from app.core.config import settings
+from app.services.activity_tracker import activity_tracker
+
+async def flush_user_activity_task():
+    """Background task that persists coalesced user activity touches"""
+    print("👣 Starting user activity flush task...")
+
+    while True:
+        try:
+            await asyncio.sleep(settings.ACTIVITY_FLUSH_INTERVAL)
+            await activity_tracker.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ User activity flush task error: {e}")
@@ -0,0 +1,16 @@
+import asyncio
+from app.core.config import settings
+from app.services.admin_registry import admin_registry
+
+async def sync_admin_registry_task():
+    """Background task that keeps this worker's admin registry in sync"""
+    print("👑 Starting admin registry sync task...")
+
+    while True:
+        try:
+            await admin_registry.listen(settings.ADMIN_REGISTRY_REFRESH_INTERVAL)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Admin registry sync task error: {e}")
+            await asyncio.sleep(1)
@@ -0,0 +1,16 @@
+import asyncio
+from app.core.config import settings
+from app.services.gift_counter import gift_win_counter
+
+async def flush_gift_counters_task():
+    """Background task that persists buffered gift win counters"""
+    print("🔢 Starting gift counter flush task...")
+
+    while True:
+        try:
+            await asyncio.sleep(settings.GIFT_COUNTER_FLUSH_INTERVAL)
+            await gift_win_counter.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Gift counter flush task error: {e}")
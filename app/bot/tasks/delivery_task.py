@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
+from app.bot.utils.methods import SendGift
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.metrics import metrics
+from app.services.gift_delivery import GiftDeliveryService, RateLimiter
+
+# Retrying won't help: the user blocked the bot, the gift is gone, the request is malformed
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound)
+
+async def gift_delivery_task(bot: Bot):
+    """Background task that drains the gift delivery queue with a pool of workers"""
+    print("🎁 Starting gift delivery task...")
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.GIFT_DELIVERY_WORKERS * 2)
+    limiter = RateLimiter(settings.GIFT_DELIVERY_RATE_LIMIT)
+    workers = [
+        asyncio.create_task(deliver_gifts_worker(bot, queue, limiter))
+        for _ in range(settings.GIFT_DELIVERY_WORKERS)
+    ]
+
+    try:
+        while True:
+            try:
+                async with async_session_maker() as session:
+                    delivery_service = GiftDeliveryService(session)
+                    stats = await delivery_service.get_queue_stats()
+                    deliveries = await delivery_service.claim_due(
+                        settings.GIFT_DELIVERY_WORKERS * 2,
+                        settings.GIFT_DELIVERY_LEASE_SECONDS
+                    )
+
+                metrics.set_gauge("delivery.queue_depth", stats["depth"])
+                metrics.set_gauge("delivery.lag_seconds", stats["lag_seconds"])
+
+                for delivery in deliveries:
+                    await queue.put(delivery)
+
+                if not deliveries:
+                    await asyncio.sleep(settings.GIFT_DELIVERY_POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Gift delivery task error: {e}")
+                await asyncio.sleep(settings.GIFT_DELIVERY_POLL_INTERVAL)
+    finally:
+        for worker in workers:
+            worker.cancel()
+
+async def deliver_gifts_worker(bot: Bot, queue: asyncio.Queue, limiter: RateLimiter):
+    while True:
+        delivery = await queue.get()
+        try:
+            await deliver_gift(bot, delivery, limiter)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Error delivering gift {delivery['id']}: {e}")
+        finally:
+            queue.task_done()
+
+async def deliver_gift(bot: Bot, delivery: Dict, limiter: RateLimiter):
+    await limiter.acquire()
+
+    # The row may have waited in the queue past its lease; only send while we own it
+    async with async_session_maker() as session:
+        if not await GiftDeliveryService(session).renew_lease(
+            delivery["id"],
+            delivery["lease_owner"],
+            settings.GIFT_DELIVERY_LEASE_SECONDS
+        ):
+            return
+
+    error = None
+    retry_after = None
+    permanent = False
+    try:
+        with metrics.timer("delivery.send_gift"):
+            await bot(SendGift(
+                user_id=delivery["user_id"],
+                gift_id=delivery["telegram_gift_id"]
+            ))
+    except TelegramRetryAfter as e:
+        error = str(e)
+        retry_after = e.retry_after
+        # The flood limit is per bot, so every worker has to wait it out
+        await limiter.pause(e.retry_after)
+    except PERMANENT_ERRORS as e:
+        error = str(e)
+        permanent = True
+    except Exception as e:
+        error = str(e)
+
+    async with async_session_maker() as session:
+        delivery_service = GiftDeliveryService(session)
+
+        if error is None:
+            if not await delivery_service.mark_delivered(delivery["id"], delivery["won_gift_id"], delivery["lease_owner"]):
+                return
+
+            created_at = delivery["created_at"]
+            if created_at is not None:
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                metrics.observe("delivery.end_to_end", (datetime.now(timezone.utc) - created_at).total_seconds())
+            return
+
+        will_retry = await delivery_service.mark_attempt_failed(
+            delivery["id"],
+            delivery["attempts"],
+            error,
+            delivery["lease_owner"],
+            retry_after,
+            permanent
+        )
+
+    if not will_retry:
+        print(f"❌ Giving up on gift delivery {delivery['id']} after {delivery['attempts']} attempts: {error}")
+        try:
+            await bot.send_message(
+                chat_id=delivery["user_id"],
+                text=(
+                    "😔 We couldn't deliver one of your gifts automatically. "
+                    f"Please contact support with your delivery ID: {delivery['id']}"
+                )
+            )
+        except Exception as e:
+            print(f"❌ Error notifying user {delivery['user_id']} about failed delivery: {e}")
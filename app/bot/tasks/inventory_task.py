@@ -0,0 +1,16 @@
+import asyncio
+from app.core.config import settings
+from app.services.gift_inventory import gift_inventory
+
+async def reconcile_gift_inventory_task():
+    """Background task that re-syncs in-memory gift stock with the database"""
+    print("📦 Starting gift inventory reconciliation task...")
+
+    while True:
+        try:
+            await asyncio.sleep(settings.GIFT_INVENTORY_RECONCILE_INTERVAL)
+            await gift_inventory.reconcile()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Gift inventory reconciliation error: {e}")
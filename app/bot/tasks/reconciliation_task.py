@@ -0,0 +1,23 @@
+import asyncio
+from datetime import timedelta
+from app.core.config import settings
+from app.services.reconciliation import reconcile_payments
+
+async def reconcile_payments_task():
+    """Background task that periodically reconciles payments against won gifts"""
+    print("🔍 Starting payment reconciliation task...")
+
+    while True:
+        try:
+            await asyncio.sleep(settings.RECONCILIATION_INTERVAL)
+            report = await reconcile_payments(
+                repair=settings.RECONCILIATION_AUTO_REPAIR,
+                stale_after=timedelta(minutes=settings.RECONCILIATION_STALE_PENDING_MINUTES),
+                chunk_size=settings.RECONCILIATION_CHUNK_SIZE
+            )
+            if report.issues:
+                print(f"⚠️ Payment reconciliation found issues: {dict(report.issues)}, repaired: {dict(report.repaired)}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Payment reconciliation error: {e}")
@@ -0,0 +1,20 @@
+import asyncio
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.services.stats_rollup import StatsRollupService
+
+async def rollup_daily_stats_task():
+    """Background task that rolls closed days up into the daily stats tables"""
+    print("📅 Starting daily stats rollup task...")
+
+    while True:
+        try:
+            await asyncio.sleep(settings.STATS_ROLLUP_INTERVAL)
+            async with async_session_maker() as session:
+                days = await StatsRollupService(session).advance()
+            if days:
+                print(f"📅 Rolled up {days} days of statistics")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Daily stats rollup task error: {e}")
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.pubsub import pubsub
+from app.services.payment import PaymentService, spin_session_channel
+
+async def sweep_spin_sessions_task():
+    """Background task that expires abandoned spin sessions and purges old ones"""
+    print("🧹 Starting spin session sweeper task...")
+
+    while True:
+        try:
+            await asyncio.sleep(settings.SPIN_SESSION_SWEEP_INTERVAL)
+            expired, purged = await sweep_spin_sessions()
+            if expired or purged:
+                print(f"🧹 Spin sessions: {expired} expired, {purged} {'archived' if settings.SPIN_SESSION_ARCHIVE else 'deleted'}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Spin session sweeper error: {e}")
+
+async def sweep_spin_sessions():
+    """One sweep in bounded batches, each in its own short transaction"""
+    expired = 0
+    purged = 0
+    batch_size = settings.SPIN_SESSION_SWEEP_BATCH_SIZE
+    expired_before = datetime.utcnow() - timedelta(hours=settings.SPIN_SESSION_RETENTION_HOURS)
+
+    for _ in range(settings.SPIN_SESSION_SWEEP_MAX_BATCHES):
+        async with async_session_maker() as session:
+            session_ids = await PaymentService(session).expire_spin_sessions(batch_size)
+
+        for session_id in session_ids:
+            await pubsub.publish(spin_session_channel(session_id), {"session_id": session_id, "status": "expired"})
+
+        expired += len(session_ids)
+        if len(session_ids) < batch_size:
+            break
+
+    for _ in range(settings.SPIN_SESSION_SWEEP_MAX_BATCHES):
+        async with async_session_maker() as session:
+            count = await PaymentService(session).purge_spin_sessions(
+                expired_before,
+                batch_size,
+                archive=settings.SPIN_SESSION_ARCHIVE
+            )
+
+        purged += count
+        if count < batch_size:
+            break
+
+    return expired, purged
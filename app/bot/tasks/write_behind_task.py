@@ -0,0 +1,16 @@
+import asyncio
+from app.core.config import settings
+from app.services.write_behind import pending_transactions
+
+async def flush_write_behind_task():
+    """Background task that persists buffered pending transactions"""
+    print("📝 Starting write-behind flush task...")
+
+    while True:
+        try:
+            await asyncio.sleep(settings.WRITE_BEHIND_FLUSH_INTERVAL)
+            await pending_transactions.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Write-behind flush task error: {e}")
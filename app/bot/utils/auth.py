@@ -1,11 +1,30 @@
 import hashlib
 import hmac
 import json
+import time
+from functools import lru_cache
 from urllib.parse import unquote
 from app.core.config import settings
+from app.core.cache import LRUCache
 from typing import Dict, Optional
 
+# sha256(init_data) -> verified fields, so repeat calls skip parsing and HMAC
+_verified_cache = LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+@lru_cache(maxsize=4)
+def _webapp_secret_key(bot_token: str) -> bytes:
+    return hmac.new(
+        "WebAppData".encode(),
+        bot_token.encode(),
+        hashlib.sha256
+    ).digest()
+
 def verify_telegram_auth(init_data: str) -> Optional[Dict]:
+    cache_key = hashlib.sha256(init_data.encode()).digest()
+    cached = _verified_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+    
     try:
         parsed_data = {}
         for item in init_data.split('&'):
@@ -17,24 +36,26 @@ def verify_telegram_auth(init_data: str) -> Optional[Dict]:
         
         received_hash = parsed_data.pop('hash')
         
-        data_check_string = '\n'.join([f"{k}={v}" for k, v in sorted(parsed_data.items())])
+        # Stale init_data is rejected even with a valid signature
+        age = time.time() - int(parsed_data.get('auth_date', 0))
+        if age > settings.INIT_DATA_MAX_AGE:
+            return None
         
-        secret_key = hmac.new(
-            "WebAppData".encode(),
-            settings.BOT_TOKEN.encode(),
-            hashlib.sha256
-        ).digest()
+        data_check_string = '\n'.join([f"{k}={v}" for k, v in sorted(parsed_data.items())])
         
         calculated_hash = hmac.new(
-            secret_key,
+            _webapp_secret_key(settings.BOT_TOKEN),
             data_check_string.encode(),
             hashlib.sha256
         ).hexdigest()
         
-        if calculated_hash == received_hash:
-            return parsed_data
+        if not hmac.compare_digest(calculated_hash, received_hash):
+            return None
         
-        return None
+        # Never cache past the point where auth_date stops being fresh
+        ttl = min(settings.AUTH_CACHE_TTL, settings.INIT_DATA_MAX_AGE - age)
+        _verified_cache.set(cache_key, parsed_data, ttl=ttl)
+        return dict(parsed_data)
     except Exception:
         return None
 
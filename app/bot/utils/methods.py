@@ -0,0 +1,21 @@
+from aiogram.methods.base import TelegramMethod
+from typing import Optional
+
+class SendGift(TelegramMethod[bool]):
+    """Bot API ``sendGift``, which aiogram 3.2.0 predates; call as ``await bot(SendGift(...))``"""
+
+    __returning__ = bool
+    __api_method__ = "sendGift"
+
+    user_id: int
+    gift_id: str
+    text: Optional[str] = None
+
+class RefundStarPayment(TelegramMethod[bool]):
+    """Bot API ``refundStarPayment``, which aiogram 3.2.0 predates; call as ``await bot(RefundStarPayment(...))``"""
+
+    __returning__ = bool
+    __api_method__ = "refundStarPayment"
+
+    user_id: int
+    telegram_payment_charge_id: str
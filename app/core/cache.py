@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import time
+
+class LRUCache:
+    """Bounded in-process LRU with an optional per-entry TTL (seconds)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+_MISSING = object()
+
+class AsyncTTLCache:
+    """Async get-or-compute cache with single-flight and stale-while-revalidate.
+
+    Meant for a small, fixed set of expensive keys. Concurrent misses on a
+    key all await one in-flight computation. Once an entry is older than
+    ``ttl`` but younger than ``ttl + stale_ttl``, callers get it at once
+    while a single background refresh replaces it. Failed computations are
+    not cached; the error goes to whoever is awaiting it.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._refresh(key, compute)
+                return value
+
+        # Shielded so one caller giving up doesn't cancel the others' computation
+        return await asyncio.shield(self._refresh(key, compute))
+
+    def _refresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, compute))
+            task.add_done_callback(_log_refresh_error)
+            self._inflight[key] = task
+        return task
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            self._entries[key] = (value, time.monotonic())
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+def _log_refresh_error(task: asyncio.Task):
+    # Background refreshes have nobody awaiting them; surface their errors here
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error refreshing cached value: {task.exception()}")
@@ -5,6 +5,9 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./test.db"
     
+    # Redis (optional, enables cross-worker caches)
+    REDIS_URL: Optional[str] = None
+    
     # Bot Configuration
     BOT_TOKEN: Optional[str] = None
     WEBHOOK_URL: Optional[str] = None
@@ -17,8 +20,15 @@ class Settings(BaseSettings):
     
     # Game Settings
     SPIN_COST: int = 10
+    SPIN_PACKS: List[int] = [1, 10, 50]
+    SPIN_SESSION_MAX_OPEN: int = 3  # unpaid spin sessions (and their reserved stock) per user
     MAX_GIFT_COST: int = 100
     
+    # Payments
+    PAYMENT_DEDUP_CACHE_SIZE: int = 10000
+    PAYMENT_DEDUP_TTL: int = 7 * 24 * 60 * 60
+    PRE_CHECKOUT_FAST_ACK: bool = True
+    
     # File Paths
     UPLOAD_DIR: str = "uploads"
     CHARTS_DIR: str = "charts"
@@ -27,13 +37,57 @@ class Settings(BaseSettings):
     # Admin Configuration
     ADMIN_USERNAMES: List[str] = ["ablaze_coder", "yordam_42"]
     ADMIN_IDS: List[int] = []
+    ADMIN_REGISTRY_REFRESH_INTERVAL: int = 300  # seconds; backstop for missed invalidations
     
     # Security
     SECRET_KEY: str = "default-secret-key-change-in-production"
+    INIT_DATA_MAX_AGE: int = 24 * 60 * 60
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: float = 300.0
+    AUTH_USER_CACHE_TTL: float = 30.0
     
     # Reminder Settings
     REMINDER_DAYS: int = 3
     
+    # Background Jobs
+    GIFT_COUNTER_FLUSH_INTERVAL: float = 2.0
+    GIFT_INVENTORY_RECONCILE_INTERVAL: float = 30.0
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 1.0
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_CLAIM_TIMEOUT: float = 60.0  # requeue a claimed batch if its flusher hasn't finished by then
+    ACTIVITY_FLUSH_INTERVAL: float = 5.0
+    ACTIVITY_FLUSH_BATCH_SIZE: int = 1000
+    SPIN_SESSION_SWEEP_INTERVAL: float = 60.0
+    SPIN_SESSION_SWEEP_BATCH_SIZE: int = 1000
+    SPIN_SESSION_SWEEP_MAX_BATCHES: int = 20
+    SPIN_SESSION_RETENTION_HOURS: int = 24
+    SPIN_SESSION_ARCHIVE: bool = True
+    RECONCILIATION_INTERVAL: float = 3600.0
+    RECONCILIATION_AUTO_REPAIR: bool = False
+    RECONCILIATION_STALE_PENDING_MINUTES: int = 60
+    RECONCILIATION_CHUNK_SIZE: int = 10000
+    STATS_ROLLUP_INTERVAL: float = 300.0
+    STATS_ROLLUP_SETTLE_MINUTES: int = 10
+    
+    # Gift Delivery
+    GIFT_DELIVERY_WORKERS: int = 4
+    GIFT_DELIVERY_RATE_LIMIT: float = 20.0
+    GIFT_DELIVERY_MAX_ATTEMPTS: int = 5
+    GIFT_DELIVERY_RETRY_BASE: float = 5.0
+    GIFT_DELIVERY_POLL_INTERVAL: float = 1.0
+    GIFT_DELIVERY_LEASE_SECONDS: float = 60.0
+    
+    # Spin Session Updates
+    SPIN_SESSION_LONG_POLL_TIMEOUT: float = 30.0
+    SPIN_SESSION_STREAM_TIMEOUT: float = 600.0
+    SSE_HEARTBEAT_INTERVAL: float = 15.0
+    
+    # Caching
+    GIFT_CATALOG_TTL: float = 300.0
+    GIFT_SAMPLER_TTL: float = 60.0  # rebuild the alias table at least this often to pick up gift edits
+    STATS_CACHE_TTL: float = 30.0
+    STATS_CACHE_STALE_TTL: float = 300.0  # serve stale stats this much longer while one refresh runs
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,17 +1,22 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.dialects import postgresql, sqlite
 from app.core.config import settings
 import asyncio
 
 Base = declarative_base()
 
+DATABASE_URL = settings.DATABASE_URL.replace("postgres://", "postgresql+asyncpg://")
+
+# SQLite (tests, local runs) doesn't pool connections
+POOL_OPTIONS = {} if DATABASE_URL.startswith("sqlite") else {"pool_size": 10, "max_overflow": 20}
+
 engine = create_async_engine(
-    settings.DATABASE_URL.replace("postgres://", "postgresql+asyncpg://"),
+    DATABASE_URL,
     echo=False,
     pool_pre_ping=True,
     pool_recycle=300,
-    pool_size=10,
-    max_overflow=20
+    **POOL_OPTIONS
 )
 
 async_session_maker = async_sessionmaker(
@@ -20,6 +25,15 @@ async_session_maker = async_sessionmaker(
     expire_on_commit=False
 )
 
+def is_postgresql() -> bool:
+    return engine.dialect.name == "postgresql"
+
+def dialect_insert(model):
+    """INSERT construct with ON CONFLICT support for the configured database"""
+    if is_postgresql():
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
 async def get_session() -> AsyncSession:
     async with async_session_maker() as session:
         try:
@@ -0,0 +1,44 @@
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict
+import time
+
+class Metrics:
+    """Tiny in-process registry of timings and gauges, exposed on /metrics"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._timings: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._gauges: Dict[str, float] = {}
+
+    def observe(self, name: str, seconds: float):
+        self._timings[name].append(seconds)
+        self._counts[name] += 1
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def set_gauge(self, name: str, value: float):
+        self._gauges[name] = value
+
+    def snapshot(self) -> Dict:
+        timings = {}
+        for name, samples in self._timings.items():
+            ordered = sorted(samples)
+            timings[name] = {
+                "count": self._counts[name],
+                "last_ms": round(samples[-1] * 1000, 3),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3)
+            }
+
+        return {"timings": timings, "gauges": dict(self._gauges)}
+
+metrics = Metrics()
@@ -0,0 +1,83 @@
+from app.core.redis_client import get_redis
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+import asyncio
+import json
+
+class PubSub:
+    """In-process pub/sub for JSON messages, fanned out through Redis when configured.
+
+    Without Redis, ``publish`` hands the message straight to local subscribers.
+    With Redis, every message goes through a Redis channel and each worker's
+    listener delivers it to its own subscribers, so a payment settled by the
+    bot process reaches clients waiting on any API worker.
+    """
+
+    CHANNEL_PREFIX = "pubsub:"
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    async def publish(self, channel: str, message: Dict):
+        redis = get_redis()
+        if redis is not None and self._listener is not None:
+            try:
+                await redis.publish(self.CHANNEL_PREFIX + channel, json.dumps(message))
+                return
+            except Exception as e:
+                print(f"Error publishing to Redis channel {channel}: {e}")
+
+        self._deliver(channel, message)
+
+    def _deliver(self, channel: str, message: Dict):
+        for queue in list(self._subscribers.get(channel, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A subscriber that stopped reading must not block the publisher
+                pass
+
+    def start(self):
+        if get_redis() is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            redis_pubsub = get_redis().pubsub()
+            try:
+                await redis_pubsub.psubscribe(self.CHANNEL_PREFIX + "*")
+                async for message in redis_pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"][len(self.CHANNEL_PREFIX):]
+                    self._deliver(channel, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Redis pub/sub listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await redis_pubsub.close()
+
+pubsub = PubSub()
@@ -0,0 +1,23 @@
+from app.core.config import settings
+from typing import Optional
+import redis.asyncio as redis
+
+_client: Optional[redis.Redis] = None
+
+def get_redis() -> Optional[redis.Redis]:
+    """Shared Redis client, or None when REDIS_URL is not configured"""
+    global _client
+
+    if not settings.REDIS_URL:
+        return None
+
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+async def close_redis():
+    global _client
+
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
@@ -10,9 +10,25 @@ from datetime import datetime
 from app.core.config import settings
 from app.core.database import init_db
 from app.api import api_router
+from app.api.dependencies import get_current_admin
 from app.services.gift import GiftService
 from app.services.admin import AdminService
+from app.services.gift_counter import gift_win_counter
+from app.bot.tasks.counter_task import flush_gift_counters_task
+from app.bot.tasks.write_behind_task import flush_write_behind_task
+from app.bot.tasks.activity_task import flush_user_activity_task
+from app.bot.tasks.inventory_task import reconcile_gift_inventory_task
+from app.bot.tasks.spin_session_task import sweep_spin_sessions_task
+from app.bot.tasks.reconciliation_task import reconcile_payments_task
+from app.bot.tasks.admin_task import sync_admin_registry_task
+from app.bot.tasks.rollup_task import rollup_daily_stats_task
+from app.services.write_behind import pending_transactions
+from app.services.activity_tracker import activity_tracker
+from app.core.metrics import metrics
 from app.core.database import async_session_maker
+from app.core.redis_client import close_redis
+from app.core.pubsub import pubsub
+from app.services.admin_registry import admin_registry
 
 # Bot initialization
 bot = None
@@ -22,6 +38,7 @@ if settings.BOT_TOKEN:
     try:
         from app.bot import create_bot, create_dispatcher
         from app.bot.tasks.reminder_task import send_reminder_task
+        from app.bot.tasks.delivery_task import gift_delivery_task
         
         bot = create_bot()
         dp = create_dispatcher()
@@ -33,6 +50,9 @@ else:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Routes that call Telegram (e.g. invoice links) reach the bot through app.state
+    app.state.bot = bot
+    
     # Initialize database
     try:
         await init_db()
@@ -59,17 +79,64 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ Data seeding failed: {e}")
     
+    # Start Redis pub/sub fan-out (no-op without REDIS_URL)
+    pubsub.start()
+    
+    # Load admins once; handlers check them in memory
+    if await admin_registry.load():
+        print("✅ Admin registry loaded")
+    
+    background_tasks = []
+    
+    # Start admin registry sync
+    background_tasks.append(asyncio.create_task(sync_admin_registry_task()))
+    print("✅ Admin registry sync task started")
+    
+    # Start gift counter flushing
+    background_tasks.append(asyncio.create_task(flush_gift_counters_task()))
+    print("✅ Gift counter flush task started")
+    
+    # Start write-behind flushing
+    background_tasks.append(asyncio.create_task(flush_write_behind_task()))
+    print("✅ Write-behind flush task started")
+    
+    # Start user activity flushing
+    background_tasks.append(asyncio.create_task(flush_user_activity_task()))
+    print("✅ User activity flush task started")
+    
+    # Start gift inventory reconciliation
+    background_tasks.append(asyncio.create_task(reconcile_gift_inventory_task()))
+    print("✅ Gift inventory reconciliation task started")
+    
+    # Start spin session sweeper
+    background_tasks.append(asyncio.create_task(sweep_spin_sessions_task()))
+    print("✅ Spin session sweeper task started")
+    
+    # Start payment reconciliation
+    background_tasks.append(asyncio.create_task(reconcile_payments_task()))
+    print("✅ Payment reconciliation task started")
+    
+    # Start daily stats rollups
+    background_tasks.append(asyncio.create_task(rollup_daily_stats_task()))
+    print("✅ Daily stats rollup task started")
+    
     # Start bot in polling mode (no webhook)
     if bot and dp:
         try:
             # Always use polling mode
             polling_task = asyncio.create_task(dp.start_polling(bot))
+            background_tasks.append(polling_task)
             print("✅ Bot started in polling mode")
             
             # Start reminder task
             reminder_task = asyncio.create_task(send_reminder_task(bot))
+            background_tasks.append(reminder_task)
             print("✅ Reminder task started")
             
+            # Start gift delivery workers
+            background_tasks.append(asyncio.create_task(gift_delivery_task(bot)))
+            print("✅ Gift delivery task started")
+            
         except Exception as e:
             print(f"❌ Bot start failed: {e}")
     
@@ -78,6 +145,22 @@ async def lifespan(app: FastAPI):
     yield
     
     # Cleanup
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    
+    flushed = await gift_win_counter.flush()
+    print(f"✅ Gift counters flushed ({flushed} pending wins)")
+    
+    written = await pending_transactions.flush()
+    print(f"✅ Write-behind buffer flushed ({written} pending transactions)")
+    
+    touched = await activity_tracker.flush()
+    print(f"✅ User activity flushed ({touched} users)")
+    
+    await pubsub.stop()
+    await close_redis()
+    
     if bot:
         try:
             await bot.session.close()
@@ -158,6 +241,11 @@ async def health_check():
         "reminder_system": "active"
     }
 
+@app.get("/metrics", dependencies=[Depends(get_current_admin)])
+async def get_metrics():
+    """In-process timings and gauges; admins only"""
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Float, BigInteger, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Text, ForeignKey, Float, BigInteger, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from enum import Enum
 from datetime import datetime
 
@@ -13,6 +13,11 @@ class TransactionStatus(str, Enum):
     FAILED = "failed"
     REFUNDED = "refunded"
 
+class DeliveryStatus(str, Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
 class BroadcastStatus(str, Enum):
     DRAFT = "draft"
     SENDING = "sending"
@@ -22,7 +27,8 @@ class BroadcastStatus(str, Enum):
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(BigInteger, primary_key=True)
+    # INTEGER on SQLite so the key is a rowid alias and gets assigned on insert
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
     telegram_id = Column(BigInteger, unique=True, nullable=False, index=True)
     username = Column(String(255), nullable=True)
     first_name = Column(String(255), nullable=True)
@@ -39,6 +45,14 @@ class User(Base):
     transactions = relationship("Transaction", back_populates="user")
     won_gifts = relationship("WonGift", back_populates="user")
     broadcast_logs = relationship("BroadcastLog", back_populates="user")
+    
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_last_activity", "last_activity"),
+        # Small partial indexes so the premium/blocked counts never scan the whole table
+        Index("ix_users_premium", "id", postgresql_where=text("is_premium = true")),
+        Index("ix_users_blocked", "id", postgresql_where=text("is_blocked = true")),
+    )
 
 class Admin(Base):
     __tablename__ = "admins"
@@ -65,6 +79,7 @@ class Gift(Base):
     win_probability = Column(Float, default=0.1)
     is_active = Column(Boolean, default=True)
     total_won = Column(Integer, default=0)
+    stock = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     won_gifts = relationship("WonGift", back_populates="gift")
@@ -75,6 +90,8 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, ForeignKey("users.telegram_id"), nullable=False)
     transaction_id = Column(String(255), unique=True, nullable=False)
+    # Links the pending row written at pre-checkout to the successful_payment that settles it
+    invoice_payload = Column(String(255), nullable=True)
     amount = Column(Integer, nullable=False)
     status = Column(String(50), nullable=False, default=TransactionStatus.PENDING)
     payment_method = Column(String(50), default="telegram_stars")
@@ -82,6 +99,17 @@ class Transaction(Base):
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
     user = relationship("User", back_populates="transactions")
+    
+    __table_args__ = (
+        Index("ix_transactions_user_id_invoice_payload", "user_id", "invoice_payload"),
+        # Revenue stats only ever read completed transactions; amount rides along for index-only sums
+        Index(
+            "ix_transactions_completed_at",
+            "completed_at",
+            postgresql_where=text("status = 'completed'"),
+            postgresql_include=["amount"]
+        ),
+    )
 
 class WonGift(Base):
     __tablename__ = "won_gifts"
@@ -97,6 +125,32 @@ class WonGift(Base):
     user = relationship("User", back_populates="won_gifts")
     gift = relationship("Gift", back_populates="won_gifts")
     transaction = relationship("Transaction")
+    
+    __table_args__ = (
+        Index("ix_won_gifts_transaction_id", "transaction_id"),
+        Index("ix_won_gifts_won_at", "won_at"),
+    )
+
+class GiftDelivery(Base):
+    __tablename__ = "gift_deliveries"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    won_gift_id = Column(Integer, ForeignKey("won_gifts.id"), unique=True, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
+    telegram_gift_id = Column(String(255), nullable=False)
+    status = Column(String(50), nullable=False, default=DeliveryStatus.PENDING, server_default=DeliveryStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    lease_owner = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+    
+    won_gift = relationship("WonGift")
+    
+    __table_args__ = (
+        Index("ix_gift_deliveries_status_next_attempt_at", "status", "next_attempt_at"),
+    )
 
 class SpinSession(Base):
     __tablename__ = "spin_sessions"
@@ -105,10 +159,36 @@ class SpinSession(Base):
     user_id = Column(BigInteger, ForeignKey("users.telegram_id"), nullable=False)
     session_id = Column(String(255), unique=True, nullable=False)
     status = Column(String(50), nullable=False)
+    spin_count = Column(Integer, nullable=False, default=1)
     result_gift_id = Column(Integer, ForeignKey("gifts.id"), nullable=True)
+    result_gift_ids = Column(JSON, nullable=True)
+    server_seed = Column(String(64), nullable=True)
+    seed_hash = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True), nullable=False)
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_spin_sessions_status_expires_at", "status", "expires_at"),
+        Index("ix_spin_sessions_user_id", "user_id"),
+    )
+
+class SpinSessionArchive(Base):
+    __tablename__ = "spin_sessions_archive"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    session_id = Column(String(255), nullable=False)
+    status = Column(String(50), nullable=False)
+    spin_count = Column(Integer, nullable=False, default=1)
+    result_gift_id = Column(Integer, nullable=True)
+    result_gift_ids = Column(JSON, nullable=True)
+    server_seed = Column(String(64), nullable=True)
+    seed_hash = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Broadcast(Base):
     __tablename__ = "broadcasts"
@@ -151,3 +231,31 @@ class AdminSession(Base):
     session_data = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True), nullable=False)
+
+class DailyUserStats(Base):
+    __tablename__ = "daily_user_stats"
+    
+    day = Column(Date, primary_key=True)
+    new_users = Column(Integer, nullable=False, default=0)
+
+class DailyRevenueStats(Base):
+    __tablename__ = "daily_revenue_stats"
+    
+    day = Column(Date, primary_key=True)
+    revenue = Column(BigInteger, nullable=False, default=0)
+    transactions = Column(Integer, nullable=False, default=0)
+
+class DailyGiftStats(Base):
+    __tablename__ = "daily_gift_stats"
+    
+    day = Column(Date, primary_key=True)
+    gift_id = Column(Integer, ForeignKey("gifts.id"), primary_key=True)
+    wins = Column(Integer, nullable=False, default=0)
+
+class StatsRollupState(Base):
+    __tablename__ = "stats_rollup_state"
+    
+    name = Column(String(50), primary_key=True)
+    # First UTC day not rolled up yet; stats read raw rows from here on
+    watermark = Column(Date, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
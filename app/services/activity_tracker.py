@@ -0,0 +1,79 @@
+from sqlalchemy import update, values, column, bindparam, BigInteger, DateTime
+from app.core.config import settings
+from app.core.database import async_session_maker, is_postgresql
+from app.models.database import User
+from datetime import datetime
+from typing import Dict, Optional
+import asyncio
+
+class ActivityTracker:
+    """Coalesces ``last_activity`` touches in memory, keyed by telegram_id.
+
+    However many times a user interacts between flushes, the flush writes one
+    row update per user, and all of them go out as a single
+    ``UPDATE users ... FROM (VALUES ...)`` per batch. Like a touch used to,
+    the update also clears ``reminder_sent_at``.
+    """
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+        self._pending: Dict[int, datetime] = {}
+        self._lock = asyncio.Lock()
+
+    def touch(self, telegram_id: int, at: Optional[datetime] = None):
+        at = at or datetime.utcnow()
+        previous = self._pending.get(telegram_id)
+        if previous is None or previous < at:
+            self._pending[telegram_id] = at
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            touches, self._pending = self._pending, {}
+            # Ordered by telegram_id so concurrent workers lock user rows in the same order
+            rows = sorted(touches.items())
+            written = 0
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    batch = rows[start:start + self.batch_size]
+                    async with async_session_maker() as session:
+                        await self._write_batch(session, batch)
+                        await session.commit()
+                    written += len(batch)
+                return written
+            except Exception as e:
+                # Keep unwritten touches for the next flush; newer ones win
+                for telegram_id, at in rows[written:]:
+                    self.touch(telegram_id, at)
+                print(f"Error flushing user activity: {e}")
+                return written
+
+    async def _write_batch(self, session, batch):
+        if is_postgresql():
+            activity = values(
+                column("telegram_id", BigInteger),
+                column("last_activity", DateTime(timezone=True)),
+                name="activity"
+            ).data(batch)
+            await session.execute(
+                update(User)
+                .where(User.telegram_id == activity.c.telegram_id)
+                .values(last_activity=activity.c.last_activity, reminder_sent_at=None)
+            )
+        else:
+            await session.execute(
+                update(User.__table__)
+                .where(User.__table__.c.telegram_id == bindparam("b_telegram_id"))
+                .values(last_activity=bindparam("b_last_activity"), reminder_sent_at=None),
+                [
+                    {"b_telegram_id": telegram_id, "b_last_activity": at}
+                    for telegram_id, at in batch
+                ]
+            )
+
+activity_tracker = ActivityTracker(batch_size=settings.ACTIVITY_FLUSH_BATCH_SIZE)
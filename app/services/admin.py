@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from app.models.database import Admin, User
 from app.core.config import settings
+from app.services.admin_registry import admin_registry
 from typing import List, Optional
 from aiogram.types import User as TelegramUser
 
@@ -10,24 +11,8 @@ class AdminService:
         self.session = session
 
     async def is_admin(self, telegram_id: int, username: str = None) -> bool:
-        try:
-            if telegram_id in settings.ADMIN_IDS:
-                return True
-            
-            if username and username in settings.ADMIN_USERNAMES:
-                return True
-            
-            result = await self.session.execute(
-                select(Admin).where(
-                    Admin.telegram_id == telegram_id,
-                    Admin.is_active == True
-                )
-            )
-            admin = result.scalar_one_or_none()
-            return admin is not None
-        except Exception as e:
-            print(f"Error checking admin status: {e}")
-            return False
+        await admin_registry.ensure_loaded()
+        return admin_registry.is_admin(telegram_id, username)
 
     async def add_admin(self, telegram_user: TelegramUser, added_by: int) -> Admin:
         try:
@@ -50,6 +35,7 @@ class AdminService:
             self.session.add(admin)
             await self.session.commit()
             await self.session.refresh(admin)
+            await admin_registry.invalidate()
             return admin
         except Exception as e:
             await self.session.rollback()
@@ -64,6 +50,7 @@ class AdminService:
                 .values(is_active=False)
             )
             await self.session.commit()
+            await admin_registry.invalidate()
             return result.rowcount > 0
         except Exception as e:
             await self.session.rollback()
@@ -111,6 +98,7 @@ class AdminService:
                         self.session.add(admin)
             
             await self.session.commit()
+            await admin_registry.invalidate()
             print("✅ Initial admins seeded successfully")
         except Exception as e:
             await self.session.rollback()
@@ -0,0 +1,73 @@
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.pubsub import pubsub
+from app.models.database import Admin
+from typing import FrozenSet, Optional
+import asyncio
+import uuid
+
+ADMINS_CHANNEL = "admins"
+
+class AdminRegistry:
+    """In-memory set of active admin telegram_ids, so admin checks never query.
+
+    Loaded at startup and reloaded by ``invalidate()`` after any change to
+    the ``admins`` table. ``invalidate()`` also publishes on the ``admins``
+    channel, and every other worker's ``listen()`` reloads its own copy.
+    ``ADMIN_IDS``/``ADMIN_USERNAMES`` from settings are checked as before.
+    """
+
+    def __init__(self):
+        self._telegram_ids: FrozenSet[int] = frozenset()
+        self.loaded = False
+        self._lock = asyncio.Lock()
+        # Lets a worker skip the reload for its own invalidation message
+        self._origin = uuid.uuid4().hex
+
+    def is_admin(self, telegram_id: int, username: Optional[str] = None) -> bool:
+        if telegram_id in settings.ADMIN_IDS:
+            return True
+
+        if username and username in settings.ADMIN_USERNAMES:
+            return True
+
+        return telegram_id in self._telegram_ids
+
+    async def load(self) -> bool:
+        async with self._lock:
+            try:
+                async with async_session_maker() as session:
+                    result = await session.execute(
+                        select(Admin.telegram_id).where(Admin.is_active == True)
+                    )
+                    self._telegram_ids = frozenset(result.scalars().all())
+                self.loaded = True
+                return True
+            except Exception as e:
+                # Keep serving the previous set rather than locking every admin out
+                print(f"Error loading admin registry: {e}")
+                return False
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await self.load()
+
+    async def invalidate(self):
+        await self.load()
+        await pubsub.publish(ADMINS_CHANNEL, {"origin": self._origin})
+
+    async def listen(self, refresh_interval: float):
+        """Reload on other workers' invalidations, and every ``refresh_interval`` regardless"""
+        async with pubsub.subscribe(ADMINS_CHANNEL) as queue:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=refresh_interval)
+                except asyncio.TimeoutError:
+                    message = None
+
+                if message is not None and message.get("origin") == self._origin:
+                    continue
+                await self.load()
+
+admin_registry = AdminRegistry()
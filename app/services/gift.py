@@ -1,8 +1,56 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, func
 from app.models.database import Gift, WonGift, User
+from app.services.gift_sampler import gift_sampler
 from typing import List, Optional
-import random
+
+DEFAULT_GIFTS = [
+    {
+        "gift_id": "premium_stickers_1",
+        "name": "🎨 Premium Sticker Pack",
+        "description": "Exclusive animated stickers",
+        "star_count": 75,
+        "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
+        "rarity": "common",
+        "win_probability": 0.3
+    },
+    {
+        "gift_id": "emoji_pack_1",
+        "name": "😎 Exclusive Emoji Pack",
+        "description": "Rare emoji collection",
+        "star_count": 100,
+        "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
+        "rarity": "uncommon",
+        "win_probability": 0.25
+    },
+    {
+        "gift_id": "channel_boost_1",
+        "name": "🚀 Channel Boost",
+        "description": "Boost your favorite channel",
+        "star_count": 125,
+        "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
+        "rarity": "rare",
+        "win_probability": 0.2
+    },
+    {
+        "gift_id": "premium_sub_1",
+        "name": "👑 Premium Subscription",
+        "description": "1 month Telegram Premium",
+        "star_count": 150,
+        "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
+        "rarity": "epic",
+        "win_probability": 0.15
+    },
+    {
+        "gift_id": "special_badge_1",
+        "name": "🏆 Special Badge",
+        "description": "Exclusive profile badge",
+        "star_count": 200,
+        "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
+        "rarity": "legendary",
+        "win_probability": 0.1
+    }
+]
 
 class GiftService:
     def __init__(self, session: AsyncSession):
@@ -28,24 +76,6 @@ class GiftService:
             print(f"Error getting gift by id: {e}")
             return None
 
-    async def get_random_gift(self) -> Optional[Gift]:
-        try:
-            gifts = await self.get_available_gifts()
-            if not gifts:
-                return None
-            
-            weights = [gift.win_probability for gift in gifts]
-            selected_gift = random.choices(gifts, weights=weights, k=1)[0]
-            
-            selected_gift.total_won += 1
-            await self.session.commit()
-            
-            return selected_gift
-        except Exception as e:
-            await self.session.rollback()
-            print(f"Error getting random gift: {e}")
-            return None
-
     async def record_won_gift(self, user_id: int, gift_id: int, transaction_id: Optional[int] = None) -> Optional[WonGift]:
         try:
             won_gift = WonGift(
@@ -81,59 +111,12 @@ class GiftService:
             if existing_gifts.scalar() > 0:
                 return
 
-            default_gifts = [
-                {
-                    "gift_id": "premium_stickers_1",
-                    "name": "🎨 Premium Sticker Pack",
-                    "description": "Exclusive animated stickers",
-                    "star_count": 75,
-                    "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
-                    "rarity": "common",
-                    "win_probability": 0.3
-                },
-                {
-                    "gift_id": "emoji_pack_1",
-                    "name": "😎 Exclusive Emoji Pack",
-                    "description": "Rare emoji collection",
-                    "star_count": 100,
-                    "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
-                    "rarity": "uncommon",
-                    "win_probability": 0.25
-                },
-                {
-                    "gift_id": "channel_boost_1",
-                    "name": "🚀 Channel Boost",
-                    "description": "Boost your favorite channel",
-                    "star_count": 125,
-                    "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
-                    "rarity": "rare",
-                    "win_probability": 0.2
-                },
-                {
-                    "gift_id": "premium_sub_1",
-                    "name": "👑 Premium Subscription",
-                    "description": "1 month Telegram Premium",
-                    "star_count": 150,
-                    "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
-                    "rarity": "epic",
-                    "win_probability": 0.15
-                },
-                {
-                    "gift_id": "special_badge_1",
-                    "name": "🏆 Special Badge",
-                    "description": "Exclusive profile badge",
-                    "star_count": 200,
-                    "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400",
-                    "rarity": "legendary",
-                    "win_probability": 0.1
-                }
-            ]
-
-            for gift_data in default_gifts:
+            for gift_data in DEFAULT_GIFTS:
                 gift = Gift(**gift_data)
                 self.session.add(gift)
 
             await self.session.commit()
+            gift_sampler.invalidate()
             print("✅ Default gifts seeded successfully")
         except Exception as e:
             await self.session.rollback()
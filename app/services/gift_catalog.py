@@ -0,0 +1,79 @@
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.database import Gift
+from app.services.gift_sampler import gift_sampler
+from typing import Optional, Tuple
+import asyncio
+import hashlib
+import json
+import time
+
+class GiftCatalog:
+    """Pre-serialized JSON of the active gifts, served by GET /roulette/gifts.
+
+    The payload follows ``gift_sampler.catalog_version``, so anything that
+    calls ``gift_sampler.invalidate()`` after editing gifts also refreshes the
+    catalog. ``GIFT_CATALOG_TTL`` bounds staleness for edits made outside the
+    app. While warm, serving the catalog never touches the DB pool.
+    """
+
+    def __init__(self):
+        self.payload: bytes = b"[]"
+        self.etag: str = ""
+        self._built_version = -1
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_version != gift_sampler.catalog_version or self._expires_at <= time.monotonic()
+
+    async def get(self) -> Tuple[bytes, str]:
+        if self.is_stale:
+            await self.refresh()
+        return self.payload, self.etag
+
+    async def refresh(self):
+        async with self._lock:
+            if not self.is_stale:
+                return
+
+            version = gift_sampler.catalog_version
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(Gift).where(Gift.is_active == True).order_by(Gift.star_count.asc())
+                )
+                gifts = result.scalars().all()
+
+            self.payload = json.dumps(
+                [
+                    {
+                        "id": gift.id,
+                        "gift_id": gift.gift_id,
+                        "name": gift.name,
+                        "description": gift.description or "",
+                        "star_count": gift.star_count,
+                        "image_url": gift.image_url or ""
+                    }
+                    for gift in gifts
+                ],
+                ensure_ascii=False,
+                separators=(",", ":")
+            ).encode()
+            self.etag = f'"{hashlib.sha256(self.payload).hexdigest()[:32]}"'
+            self._built_version = version
+            self._expires_at = time.monotonic() + settings.GIFT_CATALOG_TTL
+
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        """If-None-Match check (weak comparison, as RFC 9110 requires for it)"""
+        if not if_none_match or not etag:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+gift_catalog = GiftCatalog()
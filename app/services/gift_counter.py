@@ -0,0 +1,68 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, bindparam
+from app.core.database import async_session_maker
+from app.models.database import Gift
+from collections import defaultdict
+from typing import Dict
+import asyncio
+
+class GiftWinCounter:
+    """Buffers per-gift win increments in memory.
+
+    Wins are recorded without touching the DB and periodically flushed as one
+    relative ``total_won = total_won + :n`` UPDATE per gift, so concurrent
+    payments never lose increments and don't pay a commit per spin. (A
+    limited gift's stock was already taken when the win was reserved.)
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, int] = defaultdict(int)
+        self._in_flight: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+
+    def record(self, gift_id: int, count: int = 1):
+        self._pending[gift_id] += count
+
+    def pending_for(self, gift_id: int) -> int:
+        return self._pending.get(gift_id, 0) + self._in_flight.get(gift_id, 0)
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            self._in_flight, self._pending = dict(self._pending), defaultdict(int)
+            try:
+                # Ordered by id so concurrent workers lock gift rows in the same order
+                params = [
+                    {"b_gift_id": gift_id, "b_count": count}
+                    for gift_id, count in sorted(self._in_flight.items())
+                ]
+                async with async_session_maker() as session:
+                    await session.execute(
+                        update(Gift.__table__)
+                        .where(Gift.__table__.c.id == bindparam("b_gift_id"))
+                        .values(total_won=Gift.__table__.c.total_won + bindparam("b_count")),
+                        params
+                    )
+                    await session.commit()
+                return sum(self._in_flight.values())
+            except Exception as e:
+                # Keep the deltas for the next flush instead of dropping wins
+                for gift_id, count in self._in_flight.items():
+                    self._pending[gift_id] += count
+                print(f"Error flushing gift win counters: {e}")
+                return 0
+            finally:
+                self._in_flight = {}
+
+    async def get_totals(self, session: AsyncSession) -> Dict[int, int]:
+        """Exact total_won per gift: persisted value plus unflushed wins"""
+        async with self._lock:
+            result = await session.execute(select(Gift.id, Gift.total_won))
+            return {
+                gift_id: (total_won or 0) + self.pending_for(gift_id)
+                for gift_id, total_won in result
+            }
+
+gift_win_counter = GiftWinCounter()
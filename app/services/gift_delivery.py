@@ -0,0 +1,262 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, func
+from app.models.database import GiftDelivery, WonGift, Gift, DeliveryStatus
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import asyncio
+import random
+import time
+import uuid
+
+class RateLimiter:
+    """Token bucket shared by every delivery worker in the process.
+
+    ``pause()`` holds every send back until a flood wait is over. With
+    REDIS_URL configured the pause is shared through ``pause_key``, so all
+    processes sending as the same bot back off together.
+    """
+
+    pause_key = "delivery:paused_until"
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        # Wall clock, since it is compared with other processes' deadlines
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def pause(self, seconds: float):
+        paused_until = time.time() + seconds
+        self._paused_until = max(self._paused_until, paused_until)
+
+        client = get_redis()
+        if client is None:
+            return
+
+        try:
+            shared = await client.get(self.pause_key)
+            if shared is None or float(shared) < paused_until:
+                await client.set(self.pause_key, paused_until, px=int(seconds * 1000) + 1000)
+        except Exception as e:
+            print(f"Error sharing gift delivery pause: {e}")
+
+    async def _paused_for(self) -> float:
+        paused_until = self._paused_until
+
+        client = get_redis()
+        if client is not None:
+            try:
+                shared = await client.get(self.pause_key)
+                if shared is not None:
+                    paused_until = max(paused_until, float(shared))
+            except Exception as e:
+                print(f"Error reading gift delivery pause: {e}")
+
+        return paused_until - time.time()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                paused_for = await self._paused_for()
+                if paused_for > 0:
+                    await asyncio.sleep(paused_for)
+                    continue
+
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class GiftDeliveryService:
+    """Durable queue of gifts waiting to be sent with the Bot API's sendGift.
+
+    A claimed row belongs to the claim's ``lease_owner`` until its
+    ``next_attempt_at`` passes. Renewing the lease, marking the row
+    delivered and recording a failure all check the owner, so a row whose
+    lease ran out and was claimed again is only ever sent and settled by
+    its new owner.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def enqueue_transaction(self, transaction_id: int):
+        """Queue every gift won by a transaction; runs in the caller's DB transaction"""
+        await self.session.execute(
+            insert(GiftDelivery).from_select(
+                ["won_gift_id", "user_id", "telegram_gift_id"],
+                select(WonGift.id, WonGift.user_id, Gift.gift_id)
+                .join(Gift, WonGift.gift_id == Gift.id)
+                .where(WonGift.transaction_id == transaction_id)
+            )
+        )
+
+    async def claim_due(self, limit: int, lease_seconds: float) -> List[Dict]:
+        """Lease up to ``limit`` due deliveries.
+
+        Claimed rows are pushed ``lease_seconds`` into the future, so a worker
+        that dies mid-send just lets them become due again. SKIP LOCKED keeps
+        several API workers from claiming the same rows. Every claim gets its
+        own ``lease_owner``, returned with each row.
+        """
+        now = datetime.utcnow()
+        lease_owner = uuid.uuid4().hex
+        due = (
+            select(GiftDelivery.id)
+            .where(
+                GiftDelivery.status == DeliveryStatus.PENDING.value,
+                GiftDelivery.next_attempt_at <= now
+            )
+            .order_by(GiftDelivery.next_attempt_at.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+
+        try:
+            result = await self.session.execute(
+                update(GiftDelivery)
+                .where(GiftDelivery.id.in_(due.scalar_subquery()))
+                .values(
+                    attempts=GiftDelivery.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=lease_seconds),
+                    lease_owner=lease_owner
+                )
+                .returning(
+                    GiftDelivery.id,
+                    GiftDelivery.won_gift_id,
+                    GiftDelivery.user_id,
+                    GiftDelivery.telegram_gift_id,
+                    GiftDelivery.attempts,
+                    GiftDelivery.lease_owner,
+                    GiftDelivery.created_at
+                )
+            )
+            deliveries = [dict(row._mapping) for row in result]
+            await self.session.commit()
+            return deliveries
+        except Exception as e:
+            await self.session.rollback()
+            print(f"Error claiming gift deliveries: {e}")
+            return []
+
+    async def renew_lease(self, delivery_id: int, lease_owner: str, lease_seconds: float) -> bool:
+        """Extend a lease right before sending; False if it ran out and the row was claimed again"""
+        try:
+            result = await self.session.execute(
+                update(GiftDelivery)
+                .where(
+                    GiftDelivery.id == delivery_id,
+                    GiftDelivery.lease_owner == lease_owner,
+                    GiftDelivery.status == DeliveryStatus.PENDING.value
+                )
+                .values(next_attempt_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+                .returning(GiftDelivery.id)
+            )
+            renewed = result.scalar_one_or_none() is not None
+            await self.session.commit()
+            return renewed
+        except Exception as e:
+            await self.session.rollback()
+            print(f"Error renewing lease on gift delivery {delivery_id}: {e}")
+            return False
+
+    async def mark_delivered(self, delivery_id: int, won_gift_id: int, lease_owner: str) -> bool:
+        now = datetime.utcnow()
+        try:
+            result = await self.session.execute(
+                update(GiftDelivery)
+                .where(
+                    GiftDelivery.id == delivery_id,
+                    GiftDelivery.lease_owner == lease_owner,
+                    GiftDelivery.status == DeliveryStatus.PENDING.value
+                )
+                .values(status=DeliveryStatus.DELIVERED.value, delivered_at=now, last_error=None)
+                .returning(GiftDelivery.id)
+            )
+            if result.scalar_one_or_none() is None:
+                await self.session.rollback()
+                print(f"Lost the lease on gift delivery {delivery_id} before marking it delivered")
+                return False
+
+            await self.session.execute(
+                update(WonGift)
+                .where(WonGift.id == won_gift_id)
+                .values(is_claimed=True, claimed_at=now)
+            )
+            await self.session.commit()
+            return True
+        except Exception as e:
+            await self.session.rollback()
+            print(f"Error marking gift delivery {delivery_id} as delivered: {e}")
+            return False
+
+    async def mark_attempt_failed(
+        self,
+        delivery_id: int,
+        attempts: int,
+        error: str,
+        lease_owner: str,
+        retry_after: Optional[float] = None,
+        permanent: bool = False
+    ) -> bool:
+        """Schedule a retry with exponential backoff; returns False once attempts run out.
+
+        ``permanent`` errors (a user who blocked the bot, a gift that no
+        longer exists) fail the delivery on the first attempt.
+        """
+        give_up = permanent or attempts >= settings.GIFT_DELIVERY_MAX_ATTEMPTS
+        if retry_after is None:
+            backoff = min(settings.GIFT_DELIVERY_RETRY_BASE * 2 ** (attempts - 1), 3600)
+            retry_after = backoff * random.uniform(0.5, 1.5)
+
+        values = {"last_error": error[:1000]}
+        if give_up:
+            values["status"] = DeliveryStatus.FAILED.value
+        else:
+            values["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=retry_after)
+
+        try:
+            result = await self.session.execute(
+                update(GiftDelivery)
+                .where(
+                    GiftDelivery.id == delivery_id,
+                    GiftDelivery.lease_owner == lease_owner,
+                    GiftDelivery.status == DeliveryStatus.PENDING.value
+                )
+                .values(**values)
+                .returning(GiftDelivery.id)
+            )
+            recorded = result.scalar_one_or_none() is not None
+            await self.session.commit()
+            if not recorded:
+                # Claimed again meanwhile; the new owner takes it from here
+                return True
+        except Exception as e:
+            await self.session.rollback()
+            print(f"Error recording failed gift delivery {delivery_id}: {e}")
+
+        return not give_up
+
+    async def get_queue_stats(self) -> Dict:
+        result = await self.session.execute(
+            select(func.count(GiftDelivery.id), func.min(GiftDelivery.created_at))
+            .where(GiftDelivery.status == DeliveryStatus.PENDING.value)
+        )
+        depth, oldest = result.one()
+
+        lag = 0.0
+        if oldest is not None:
+            if oldest.tzinfo is None:
+                oldest = oldest.replace(tzinfo=timezone.utc)
+            lag = max(0.0, (datetime.now(timezone.utc) - oldest).total_seconds())
+
+        return {"depth": depth or 0, "lag_seconds": lag}
@@ -0,0 +1,123 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, or_
+from app.core.database import async_session_maker
+from app.models.database import Gift
+from collections import Counter
+from typing import Dict, Sequence
+
+class GiftInventory:
+    """Stock reservations for limited gifts.
+
+    ``Gift.stock`` is the stock nobody has reserved yet (NULL means
+    unlimited) and is shared by every worker. ``reserve()`` takes units with
+    a conditional
+
+        UPDATE gifts SET stock = stock - :n WHERE id = :id AND stock >= :n
+
+    in the caller's transaction, so two workers can never hand out the same
+    unit, and ``restore()`` gives them back (an expired spin session, say).
+    Paid wins simply keep their units.
+
+    Draws first ``take()`` units from a per-process copy of the stock, so
+    the sampler can leave sold out gifts out of its table without a query
+    per draw; ``reconcile()`` re-reads it from the DB. ``version`` changes
+    whenever a gift runs out or comes back, which is the sampler's cue to
+    renormalize its weights.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._available: Dict[int, int] = {}
+
+    def sync(self, gifts: Sequence[Gift]):
+        stock = {gift.id: gift.stock for gift in gifts if gift.stock is not None}
+        self._apply_stock(stock)
+
+    async def reconcile(self):
+        """Re-read stock from the DB"""
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(Gift.id, Gift.stock).where(Gift.stock.isnot(None))
+            )
+            self._apply_stock(dict(result.all()))
+
+    def _apply_stock(self, stock: Dict[int, int]):
+        available = {gift_id: max(0, remaining) for gift_id, remaining in stock.items()}
+
+        exhausted_before = {gift_id for gift_id, units in self._available.items() if units <= 0}
+        exhausted_after = {gift_id for gift_id, units in available.items() if units <= 0}
+        if exhausted_before != exhausted_after or self._available.keys() != available.keys():
+            self.version += 1
+
+        self._available = available
+
+    def _set_available(self, gift_id: int, units: int):
+        if (self._available.get(gift_id, 1) <= 0) != (units <= 0):
+            self.version += 1
+        self._available[gift_id] = max(0, units)
+
+    def is_available(self, gift_id: int) -> bool:
+        return self._available.get(gift_id, 1) > 0
+
+    def take(self, gift_id: int) -> bool:
+        """Take one unit from this process's copy; always succeeds for unlimited gifts"""
+        if gift_id not in self._available:
+            return True
+
+        if self._available[gift_id] <= 0:
+            return False
+
+        self._available[gift_id] -= 1
+        if self._available[gift_id] == 0:
+            self.version += 1
+        return True
+
+    def put_back(self, gift_ids: Sequence[int]):
+        for gift_id in gift_ids:
+            if gift_id in self._available:
+                if self._available[gift_id] == 0:
+                    self.version += 1
+                self._available[gift_id] += 1
+
+    async def reserve(self, session: AsyncSession, gift_ids: Sequence[int]) -> bool:
+        """Reserve the stock of already taken gifts in the caller's transaction.
+
+        All or nothing: when another worker got to the last units first,
+        whatever was reserved is given back, the taken units are put back
+        and the gift's local stock is corrected, so the next draw skips it.
+        The reservation commits or rolls back with the caller's transaction;
+        if it raises, putting the taken units back is up to the caller.
+        """
+        counts = sorted(Counter(gift_id for gift_id in gift_ids if gift_id in self._available).items())
+        reserved: Dict[int, int] = {}
+        # Ordered by id so concurrent reservations lock gift rows in the same order
+        for gift_id, count in counts:
+            result = await session.execute(
+                update(Gift)
+                .where(Gift.id == gift_id, or_(Gift.stock.is_(None), Gift.stock >= count))
+                .values(stock=Gift.stock - count)
+                .returning(Gift.stock)
+            )
+            row = result.one_or_none()
+            if row is None:
+                await self.restore(session, list(Counter(reserved).elements()))
+                self.put_back(gift_ids)
+                remaining = await session.scalar(select(Gift.stock).where(Gift.id == gift_id))
+                self._set_available(gift_id, remaining or 0)
+                return False
+            reserved[gift_id] = count
+            if row.stock is not None:
+                # The shared count is fresher than ours
+                self._set_available(gift_id, row.stock)
+        return True
+
+    async def restore(self, session: AsyncSession, gift_ids: Sequence[int]):
+        """Give reserved units back to the shared stock in the caller's transaction"""
+        for gift_id, count in sorted(Counter(gift_ids).items()):
+            await session.execute(
+                update(Gift)
+                .where(Gift.id == gift_id, Gift.stock.isnot(None))
+                .values(stock=Gift.stock + count)
+            )
+
+gift_inventory = GiftInventory()
@@ -0,0 +1,192 @@
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.database import Gift
+from app.services.gift_inventory import GiftInventory, gift_inventory
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+import asyncio
+import hashlib
+import hmac
+import random
+import time
+
+_default_rng = np.random.default_rng()
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) build, O(1) weighted draws"""
+
+    def __init__(self, weights: Sequence[float]):
+        size = len(weights)
+        total = float(sum(weights))
+        if size == 0 or total <= 0:
+            raise ValueError("Alias table needs at least one positive weight")
+
+        scaled = [weight * size / total for weight in weights]
+        self.size = size
+        self.prob = [1.0] * size
+        self.alias = list(range(size))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+        # Whatever is left over is 1.0 up to float rounding
+        for i in small + large:
+            self.prob[i] = 1.0
+            self.alias[i] = i
+
+        self._prob_array = np.array(self.prob)
+        self._alias_array = np.array(self.alias)
+
+    def pick(self, uniform: float) -> int:
+        # One uniform sample in [0, 1) picks the column and flips the biased coin
+        u = uniform * self.size
+        column = int(u)
+        return column if u - column < self.prob[column] else self.alias[column]
+
+    def draw(self, rng: random.Random = random) -> int:
+        return self.pick(rng.random())
+
+    def draw_many(self, count: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """Vectorized version of draw() returning ``count`` indexes"""
+        rng = _default_rng if rng is None else rng
+        u = rng.random(count) * self.size
+        columns = u.astype(np.int64)
+        accept = (u - columns) < self._prob_array[columns]
+        return np.where(accept, columns, self._alias_array[columns])
+
+class GiftSampler:
+    """Process-wide weighted gift picker.
+
+    The alias table is rebuilt from the active gifts when the catalog version
+    has moved since the last build, and at least every ``GIFT_SAMPLER_TTL``
+    seconds so weight and active-flag edits made outside this process (admin
+    tools, SQL, other workers) reach the odds. Regular draws never hit the DB.
+    Every drawn gift takes a unit from the inventory; gifts that run out are
+    dropped from the table and the remaining weights renormalized in memory.
+    The inventory defaults to the process-wide one; pass another to sample
+    without touching real stock.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, inventory: Optional[GiftInventory] = None):
+        self.ttl = settings.GIFT_SAMPLER_TTL if ttl is None else ttl
+        self.inventory = gift_inventory if inventory is None else inventory
+        self.catalog_version = 0
+        self._built_version = -1
+        self._inventory_version = -1
+        self._expires_at = 0.0
+        self._catalog: List[Gift] = []
+        self._gifts: List[Gift] = []
+        self._table: Optional[AliasTable] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_version != self.catalog_version or self._expires_at <= time.monotonic()
+
+    def invalidate(self):
+        """Mark the catalog as changed; the next draw rebuilds the table"""
+        self.catalog_version += 1
+
+    async def refresh(self):
+        async with self._lock:
+            if not self.is_stale:
+                return
+
+            version = self.catalog_version
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(Gift).where(Gift.is_active == True).order_by(Gift.id.asc())
+                )
+                gifts = result.scalars().all()
+
+            self.build(gifts, version)
+
+    def build(self, gifts: Sequence[Gift], version: Optional[int] = None):
+        self._catalog = [gift for gift in gifts if gift.win_probability and gift.win_probability > 0]
+        self.inventory.sync(self._catalog)
+        self._built_version = self.catalog_version if version is None else version
+        self._expires_at = time.monotonic() + self.ttl
+        self._rebalance()
+
+    def _rebalance(self):
+        # Renormalize over the gifts that still have stock; no DB access
+        self._inventory_version = self.inventory.version
+        self._gifts = [gift for gift in self._catalog if self.inventory.is_available(gift.id)]
+        self._table = AliasTable([gift.win_probability for gift in self._gifts]) if self._gifts else None
+
+    async def _ensure_table(self):
+        if self.is_stale:
+            await self.refresh()
+        if self._inventory_version != self.inventory.version:
+            self._rebalance()
+
+    def _take(self, pick: Callable[[AliasTable], int]) -> Optional[Gift]:
+        # Synchronous, so draw + reservation can't interleave with another spin
+        while self._table:
+            gift = self._gifts[pick(self._table)]
+            if self.inventory.take(gift.id):
+                return gift
+            self._rebalance()
+        return None
+
+    async def get_gifts(self) -> List[Gift]:
+        await self._ensure_table()
+        return list(self._gifts)
+
+    async def draw(self) -> Optional[Gift]:
+        await self._ensure_table()
+        return self._take(lambda table: table.draw())
+
+    async def draw_many(self, count: int) -> List[Gift]:
+        """Draw ``count`` gifts; returns [] (taking nothing) if stock runs out"""
+        await self._ensure_table()
+
+        if not self._table:
+            return []
+
+        gifts = self._gifts
+        won_gifts = []
+        for i in self._table.draw_many(count):
+            gift = gifts[i]
+            if not self.inventory.take(gift.id):
+                self._rebalance()
+                gift = self._take(lambda table: table.draw())
+                if gift is None:
+                    self.inventory.put_back([won_gift.id for won_gift in won_gifts])
+                    return []
+            won_gifts.append(gift)
+        return won_gifts
+
+    async def draw_seeded(self, server_seed: str, nonce: str, count: int = 1) -> List[Gift]:
+        """Deterministic draws for provably fair spins.
+
+        Spin ``i`` uses HMAC-SHA256(server_seed, f"{nonce}:{i}") as its uniform
+        sample, so anyone holding the revealed seed can replay the outcome
+        against the catalog (minus gifts that were out of stock).
+        """
+        await self._ensure_table()
+
+        won_gifts = []
+        for i in range(count):
+            digest = hmac.new(server_seed.encode(), f"{nonce}:{i}".encode(), hashlib.sha256).digest()
+            uniform = int.from_bytes(digest[:8], "big") / 2 ** 64
+            gift = self._take(lambda table: table.pick(uniform))
+            if gift is None:
+                self.inventory.put_back([won_gift.id for won_gift in won_gifts])
+                return []
+            won_gifts.append(gift)
+        return won_gifts
+
+gift_sampler = GiftSampler()
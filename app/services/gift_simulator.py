@@ -0,0 +1,189 @@
+"""Offline payout checks for the gift table.
+
+    python -m app.services.gift_simulator --spins 10000000
+    python -m app.services.gift_simulator --source db --spin-cost 100 --benchmark
+
+Simulates spins with the same alias table the production sampler uses and
+reports return-to-player (gift value paid out per star spent), its variance,
+tail percentiles over player sessions and per-gift hit rates.
+"""
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.database import Gift
+from app.services.gift import DEFAULT_GIFTS
+from app.services.gift_inventory import GiftInventory
+from app.services.gift_sampler import AliasTable, GiftSampler
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import argparse
+import asyncio
+import time
+
+TAIL_PERCENTILES = [1, 5, 50, 95, 99, 99.9]
+
+def default_gifts() -> List[Gift]:
+    return [Gift(id=i, is_active=True, **data) for i, data in enumerate(DEFAULT_GIFTS, start=1)]
+
+async def load_gifts() -> List[Gift]:
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(Gift).where(Gift.is_active == True).order_by(Gift.id.asc())
+        )
+        return result.scalars().all()
+
+def expected_rtp(gifts: Sequence[Gift], spin_cost: int) -> float:
+    weights = np.array([gift.win_probability for gift in gifts], dtype=float)
+    values = np.array([gift.star_count for gift in gifts], dtype=float)
+    return float((weights / weights.sum() * values).sum() / spin_cost)
+
+def simulate(
+    gifts: Sequence[Gift],
+    spins: int,
+    spin_cost: int,
+    session_spins: int = 100,
+    chunk_size: int = 1_000_000,
+    seed: Optional[int] = None
+) -> Dict:
+    """Monte Carlo run of ``spins`` draws, in chunks so memory stays flat"""
+    gifts = [gift for gift in gifts if gift.win_probability and gift.win_probability > 0]
+    table = AliasTable([gift.win_probability for gift in gifts])
+    values = np.array([gift.star_count for gift in gifts], dtype=float)
+    rng = np.random.default_rng(seed)
+
+    # Whole player sessions per chunk so tail stats never straddle chunks
+    chunk_size = max(session_spins, chunk_size - chunk_size % session_spins)
+
+    hits = np.zeros(len(gifts), dtype=np.int64)
+    payout_sum = 0.0
+    payout_sq_sum = 0.0
+    session_rtps = []
+    done = 0
+
+    while done < spins:
+        count = min(chunk_size, spins - done)
+        indexes = table.draw_many(count, rng)
+        payouts = values[indexes]
+
+        hits += np.bincount(indexes, minlength=len(gifts))
+        payout_sum += payouts.sum()
+        payout_sq_sum += np.square(payouts).sum()
+
+        full_sessions = count // session_spins
+        if full_sessions:
+            per_session = payouts[:full_sessions * session_spins].reshape(full_sessions, session_spins)
+            session_rtps.append(per_session.sum(axis=1) / (session_spins * spin_cost))
+
+        done += count
+
+    mean_payout = payout_sum / spins
+    variance = max(0.0, payout_sq_sum / spins - mean_payout ** 2)
+    session_rtps = np.concatenate(session_rtps) if session_rtps else np.array([])
+    weights = np.array([gift.win_probability for gift in gifts], dtype=float)
+    expected_hits = weights / weights.sum()
+
+    return {
+        "spins": spins,
+        "spin_cost": spin_cost,
+        "rtp": mean_payout / spin_cost,
+        "expected_rtp": expected_rtp(gifts, spin_cost),
+        "house_edge": 1 - mean_payout / spin_cost,
+        "payout_mean": mean_payout,
+        "payout_variance": variance,
+        "payout_std": variance ** 0.5,
+        "rtp_std_error": (variance / spins) ** 0.5 / spin_cost,
+        "session_spins": session_spins,
+        "sessions": int(session_rtps.size),
+        "session_rtp_percentiles": {
+            p: float(value)
+            for p, value in zip(TAIL_PERCENTILES, np.percentile(session_rtps, TAIL_PERCENTILES))
+        } if session_rtps.size else {},
+        "player_profit_rate": float((session_rtps > 1).mean()) if session_rtps.size else 0.0,
+        "gifts": [
+            {
+                "name": gift.name,
+                "star_count": gift.star_count,
+                "hits": int(hits[i]),
+                "hit_rate": hits[i] / spins,
+                "expected_rate": float(expected_hits[i])
+            }
+            for i, gift in enumerate(gifts)
+        ]
+    }
+
+async def benchmark(gifts: Sequence[Gift], draws: int = 1_000_000) -> Dict[str, float]:
+    """Draws per second for each way the app samples gifts"""
+    gifts = [gift for gift in gifts if gift.win_probability and gift.win_probability > 0]
+    table = AliasTable([gift.win_probability for gift in gifts])
+    results = {}
+
+    started = time.perf_counter()
+    for _ in range(draws):
+        table.draw()
+    results["alias_table.draw"] = draws / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    table.draw_many(draws)
+    results["alias_table.draw_many"] = draws / (time.perf_counter() - started)
+
+    # Full production path, including the inventory bookkeeping per draw, on
+    # a private inventory so real stock and other samplers are left alone
+    sampler = GiftSampler(ttl=float("inf"), inventory=GiftInventory())
+    sampler.build(gifts)
+    sampler_draws = min(draws, 200_000)
+    started = time.perf_counter()
+    for _ in range(sampler_draws):
+        await sampler.draw()
+    results["gift_sampler.draw"] = sampler_draws / (time.perf_counter() - started)
+
+    pack = max(settings.SPIN_PACKS)
+    started = time.perf_counter()
+    for _ in range(sampler_draws // pack):
+        await sampler.draw_many(pack)
+    results[f"gift_sampler.draw_many({pack})"] = (sampler_draws // pack * pack) / (time.perf_counter() - started)
+
+    return results
+
+def print_report(report: Dict):
+    print(f"🎰 {report['spins']:,} spins at {report['spin_cost']} ⭐ each")
+    print(f"RTP:            {report['rtp']:.4%} (expected {report['expected_rtp']:.4%}, ±{report['rtp_std_error']:.4%})")
+    print(f"House edge:     {report['house_edge']:.4%}")
+    print(f"Payout/spin:    mean {report['payout_mean']:.2f} ⭐, std {report['payout_std']:.2f} ⭐, variance {report['payout_variance']:.2f}")
+
+    if report["session_rtp_percentiles"]:
+        print(f"\nRTP over {report['sessions']:,} sessions of {report['session_spins']} spins:")
+        for p, value in report["session_rtp_percentiles"].items():
+            print(f"  p{p:<5} {value:.4%}")
+        print(f"  sessions where the player profits: {report['player_profit_rate']:.4%}")
+
+    print("\nGift                              Stars   Hit rate   Expected")
+    for gift in report["gifts"]:
+        print(f"  {gift['name']:<30} {gift['star_count']:>6}   {gift['hit_rate']:>8.4%}   {gift['expected_rate']:>8.4%}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Simulate spin payouts for the gift table")
+    parser.add_argument("--source", choices=["default", "db"], default="default", help="default seed gifts or active gifts from the DB")
+    parser.add_argument("--spins", type=int, default=10_000_000)
+    parser.add_argument("--spin-cost", type=int, default=settings.SPIN_COST)
+    parser.add_argument("--session-spins", type=int, default=100, help="spins per player session for tail percentiles")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--benchmark", action="store_true", help="also measure sampler draws per second")
+    args = parser.parse_args()
+
+    gifts = await load_gifts() if args.source == "db" else default_gifts()
+    if not gifts:
+        print("❌ No active gifts to simulate")
+        return
+
+    started = time.perf_counter()
+    report = simulate(gifts, args.spins, args.spin_cost, args.session_spins, seed=args.seed)
+    print_report(report)
+    print(f"\n⏱️ Simulated in {time.perf_counter() - started:.2f}s")
+
+    if args.benchmark:
+        print("\nDraws per second:")
+        for name, rate in (await benchmark(gifts)).items():
+            print(f"  {name:<32} {rate:>14,.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,35 +1,148 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.models.database import Transaction, SpinSession
+from sqlalchemy import select, insert, update, delete, exists, literal, union_all, true, func, BigInteger, Integer, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from app.models.database import User, Transaction, SpinSession, SpinSessionArchive, WonGift, Gift, TransactionStatus
 from app.core.config import settings
+from app.core.database import dialect_insert, is_postgresql
+from app.services.gift_sampler import gift_sampler
+from app.services.gift_counter import gift_win_counter
+from app.services.gift_delivery import GiftDeliveryService
+from app.services.gift_inventory import gift_inventory
+from app.services.payment_dedup import payment_dedup
+from collections import Counter
+import hashlib
+import secrets
 import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Awaitable, Callable, Optional, Dict, List, Tuple
+
+SPIN_SESSION_TTL = timedelta(minutes=10)
+# Invoices paid a little after the session expired still get its outcome
+SPIN_SESSION_GRACE = timedelta(minutes=10)
+# Draws repeated when another worker sold out a drawn gift first
+RESERVE_ATTEMPTS = 3
+
+class SoldOutError(ValueError):
+    """Every gift that could be drawn is out of stock"""
+
+def spin_session_channel(session_id: str) -> str:
+    """Pub/sub channel carrying status updates for one spin session"""
+    return f"spin_session:{session_id}"
 
 class PaymentService:
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def create_spin_session(self, user_id: int) -> SpinSession:
+    async def create_spin_session(self, user_id: int, spin_count: int = 1) -> SpinSession:
+        """Open a spin session with its outcome drawn and its gifts' stock reserved.
+
+        Raises ValueError when the user already has ``SPIN_SESSION_MAX_OPEN``
+        unpaid sessions holding stock, so nobody can hoard limited gifts by
+        opening invoices they never pay, and SoldOutError when nothing is
+        left to draw, so no invoice is sold for a spin that can't pay out.
+        """
         session_id = str(uuid.uuid4())
-        expires_at = datetime.utcnow() + timedelta(minutes=10)
-        
-        spin_session = SpinSession(
-            user_id=user_id,
-            session_id=session_id,
-            status="pending",
-            expires_at=expires_at
-        )
+        expires_at = datetime.utcnow() + SPIN_SESSION_TTL
+        result_gift_ids: List[int] = []
         
-        self.session.add(spin_session)
-        await self.session.commit()
+        try:
+            # Lock the user row so concurrent requests can't both get under the cap
+            await self.session.execute(
+                select(User.id).where(User.telegram_id == user_id).with_for_update()
+            )
+            open_sessions = await self.session.scalar(
+                select(func.count(SpinSession.id)).where(
+                    SpinSession.user_id == user_id,
+                    SpinSession.status == "pending",
+                    SpinSession.expires_at > datetime.utcnow() - SPIN_SESSION_GRACE
+                )
+            )
+            if open_sessions >= settings.SPIN_SESSION_MAX_OPEN:
+                raise ValueError("Too many unpaid spin sessions, pay or wait for one to expire")
+            
+            # The outcome is fixed now and committed to by the seed hash; the seed
+            # itself is only revealed once the spin is paid
+            server_seed = secrets.token_hex(32)
+            result_gifts = await self.reserve_draw(
+                lambda: gift_sampler.draw_seeded(server_seed, session_id, spin_count)
+            )
+            result_gift_ids = [gift.id for gift in result_gifts]
+            if not result_gift_ids:
+                raise SoldOutError("All gifts are sold out")
+            
+            spin_session = SpinSession(
+                user_id=user_id,
+                session_id=session_id,
+                status="pending",
+                spin_count=spin_count,
+                result_gift_id=result_gift_ids[0],
+                result_gift_ids=result_gift_ids,
+                server_seed=server_seed,
+                seed_hash=hashlib.sha256(server_seed.encode()).hexdigest(),
+                expires_at=expires_at
+            )
+            
+            self.session.add(spin_session)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            gift_inventory.put_back(result_gift_ids)
+            raise
         await self.session.refresh(spin_session)
         return spin_session
     
-    async def create_transaction(self, user_id: int, amount: int, transaction_id: str) -> Transaction:
+    async def reserve_draw(self, draw: Callable[[], Awaitable[List[Gift]]]) -> List[Gift]:
+        """Draw gifts and reserve their stock in this session's transaction.
+
+        If another worker sold out a drawn gift first, the sampler has
+        already dropped it and the draw is repeated. Returns [] once stock
+        runs out.
+        """
+        for _ in range(RESERVE_ATTEMPTS):
+            gifts = await draw()
+            if not gifts:
+                return []
+            
+            gift_ids = [gift.id for gift in gifts]
+            try:
+                if await gift_inventory.reserve(self.session, gift_ids):
+                    return gifts
+            except Exception:
+                gift_inventory.put_back(gift_ids)
+                raise
+        return []
+    
+    async def cancel_spin_session(self, session_id: str):
+        """Expire a pending session that can never be paid (say its invoice failed) and free its stock"""
+        try:
+            result = await self.session.execute(
+                update(SpinSession)
+                .where(SpinSession.session_id == session_id, SpinSession.status == "pending")
+                .values(status="expired")
+                .returning(SpinSession.result_gift_ids)
+            )
+            gift_ids = result.scalar_one_or_none() or []
+            await gift_inventory.restore(self.session, gift_ids)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        gift_inventory.put_back(gift_ids)
+    
+    async def create_transaction(
+        self,
+        user_id: int,
+        amount: int,
+        transaction_id: str,
+        invoice_payload: Optional[str] = None
+    ) -> Transaction:
         transaction = Transaction(
             user_id=user_id,
             transaction_id=transaction_id,
+            invoice_payload=invoice_payload,
             amount=amount,
             status="pending"
         )
@@ -74,3 +187,436 @@ class PaymentService:
             await self.session.refresh(session)
         
         return session
+    
+    async def expire_spin_sessions(self, batch_size: int) -> List[str]:
+        """Mark up to ``batch_size`` abandoned pending sessions as expired and free their stock.
+
+        Only sessions past their grace period are touched, so a late payment
+        can still claim its session. Returns the expired session ids.
+        """
+        abandoned = (
+            select(SpinSession.id)
+            .where(
+                SpinSession.status == "pending",
+                SpinSession.expires_at < datetime.utcnow() - SPIN_SESSION_GRACE
+            )
+            .order_by(SpinSession.expires_at.asc())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        
+        try:
+            result = await self.session.execute(
+                update(SpinSession)
+                .where(SpinSession.id.in_(abandoned.scalar_subquery()))
+                .values(status="expired")
+                .returning(SpinSession.session_id, SpinSession.result_gift_ids)
+            )
+            rows = result.all()
+            # Their reserved stock goes back in the same transaction
+            gift_ids = [gift_id for row in rows for gift_id in row.result_gift_ids or []]
+            await gift_inventory.restore(self.session, gift_ids)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        
+        gift_inventory.put_back(gift_ids)
+        return [row.session_id for row in rows]
+    
+    async def purge_spin_sessions(self, expired_before: datetime, batch_size: int, archive: bool = True) -> int:
+        """Move (or just delete) up to ``batch_size`` expired sessions; returns how many"""
+        batch = (
+            select(SpinSession.id)
+            .where(
+                SpinSession.status == "expired",
+                SpinSession.expires_at < expired_before
+            )
+            .order_by(SpinSession.expires_at.asc())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        
+        try:
+            session_ids = list((await self.session.execute(batch)).scalars().all())
+            if not session_ids:
+                return 0
+            
+            if archive:
+                columns = [column.name for column in SpinSession.__table__.columns]
+                await self.session.execute(
+                    insert(SpinSessionArchive).from_select(
+                        columns,
+                        select(*SpinSession.__table__.columns).where(SpinSession.id.in_(session_ids))
+                    )
+                )
+            await self.session.execute(
+                delete(SpinSession).where(SpinSession.id.in_(session_ids))
+            )
+            await self.session.commit()
+            return len(session_ids)
+        except Exception:
+            await self.session.rollback()
+            raise
+    
+    @staticmethod
+    def spins_for_amount(amount: int) -> Optional[int]:
+        """Number of spins bought by a Stars amount, or None if it matches no pack"""
+        if amount <= 0 or amount % settings.SPIN_COST:
+            return None
+        spin_count = amount // settings.SPIN_COST
+        return spin_count if spin_count in settings.SPIN_PACKS else None
+    
+    async def claim_spin_session(self, session_id: str, user_id: int, spin_count: int) -> Optional[Row]:
+        """Flip a pending spin session to completed and return its precomputed outcome.
+
+        The returned row carries ``result_gift_ids`` and the now revealable
+        ``server_seed``. Sessions past their grace period can't be claimed:
+        their held stock may already be back in the pool.
+
+        Runs inside the caller's transaction, so it is rolled back together
+        with the settlement if that turns out to be a duplicate.
+        """
+        result = await self.session.execute(
+            update(SpinSession)
+            .where(
+                SpinSession.session_id == session_id,
+                SpinSession.user_id == user_id,
+                SpinSession.spin_count == spin_count,
+                SpinSession.status == "pending",
+                SpinSession.expires_at > datetime.utcnow() - SPIN_SESSION_GRACE,
+                SpinSession.result_gift_ids.isnot(None)
+            )
+            .values(status="completed", completed_at=func.now())
+            .returning(SpinSession.result_gift_ids, SpinSession.server_seed)
+        )
+        return result.one_or_none()
+    
+    async def get_gifts_by_ids(self, gift_ids: List[int]) -> Dict[int, Gift]:
+        # Read from the DB rather than the sampler's cache, which still holds gifts deleted since its last build
+        result = await self.session.execute(select(Gift).where(Gift.id.in_(set(gift_ids))))
+        return {gift.id: gift for gift in result.scalars().all()}
+    
+    async def load_session_gifts(self, gift_ids: List[int]) -> Tuple[List[Gift], List[Gift]]:
+        """A claimed session's gifts, with any deleted since the draw replaced by a fresh draw.
+
+        Returns the gifts to award and the replacements among them, whose
+        stock is reserved in this transaction; the gifts are [] if no
+        replacement is in stock.
+        """
+        gifts_by_id = await self.get_gifts_by_ids(gift_ids)
+        missing = [index for index, gift_id in enumerate(gift_ids) if gift_id not in gifts_by_id]
+        if not missing:
+            return [gifts_by_id[gift_id] for gift_id in gift_ids], []
+        
+        print(f"Gifts {sorted({gift_ids[index] for index in missing})} are gone, redrawing {len(missing)} spins")
+        # The alias table may still hold the deleted gifts
+        gift_sampler.invalidate()
+        replacements = await self.reserve_draw(lambda: gift_sampler.draw_many(len(missing)))
+        if not replacements:
+            return [], []
+        
+        won_gifts = [gifts_by_id.get(gift_id) for gift_id in gift_ids]
+        for index, gift in zip(missing, replacements):
+            won_gifts[index] = gift
+        return won_gifts, replacements
+    
+    async def settle_spin_payment(
+        self,
+        user_id: int,
+        charge_id: str,
+        amount: int,
+        gift_ids: List[int],
+        invoice_payload: Optional[str] = None
+    ) -> Optional[Dict]:
+        """Complete the transaction, record every won gift and queue its delivery in one DB transaction.
+
+        The pending row written at pre-checkout for the same invoice payload
+        is completed in place and takes the charge id; without one (say its
+        buffered insert hasn't landed yet) a completed row is inserted.
+        Returns None when the charge was already settled, so a redelivered
+        payment never records a second set of gifts.
+        """
+        completed = TransactionStatus.COMPLETED.value
+        pending = aliased(Transaction)
+        settled = aliased(Transaction)
+        complete_pending = (
+            update(Transaction)
+            .where(
+                Transaction.id == (
+                    select(pending.id)
+                    .where(
+                        pending.user_id == user_id,
+                        pending.invoice_payload == invoice_payload,
+                        pending.amount == amount,
+                        pending.status == TransactionStatus.PENDING.value
+                    )
+                    .order_by(pending.id.asc())
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                    .scalar_subquery()
+                ),
+                ~exists().where(settled.transaction_id == charge_id)
+            )
+            .values(transaction_id=charge_id, status=completed, completed_at=func.now())
+            .returning(Transaction.id)
+        )
+        columns = {
+            "user_id": literal(user_id, BigInteger),
+            "transaction_id": literal(charge_id, String),
+            "invoice_payload": literal(invoice_payload, String),
+            "amount": literal(amount, Integer),
+            "status": literal(completed, String),
+            "completed_at": func.now()
+        }
+        
+        def insert_transaction(condition=true()):
+            # SQLite needs the WHERE to tell the SELECT apart from the ON CONFLICT clause
+            insert_completed = dialect_insert(Transaction).from_select(
+                list(columns),
+                select(*columns.values()).where(condition)
+            )
+            return (
+                insert_completed
+                .on_conflict_do_update(
+                    index_elements=[Transaction.transaction_id],
+                    set_={"status": completed, "completed_at": func.now()},
+                    # A refunded charge must not be paid out after all
+                    where=Transaction.status.notin_([completed, TransactionStatus.REFUNDED.value])
+                )
+                .returning(Transaction.id)
+            )
+        
+        try:
+            if is_postgresql():
+                # Single statement: complete the pending row or insert one, then bulk insert
+                # the WonGifts from whichever RETURNING produced the transaction id
+                if invoice_payload:
+                    completed_pending = complete_pending.cte("completed_pending")
+                    inserted = insert_transaction(~exists(select(completed_pending.c.id))).cte("inserted_transaction")
+                    settled_transaction = union_all(
+                        select(completed_pending.c.id),
+                        select(inserted.c.id)
+                    ).cte("settled_transaction")
+                else:
+                    settled_transaction = insert_transaction().cte("settled_transaction")
+                result = await self.session.execute(
+                    insert(WonGift)
+                    .from_select(
+                        ["user_id", "gift_id", "transaction_id"],
+                        select(
+                            literal(user_id, BigInteger),
+                            func.unnest(literal(gift_ids, postgresql.ARRAY(Integer))),
+                            settled_transaction.c.id
+                        )
+                    )
+                    .returning(WonGift.id, WonGift.transaction_id)
+                )
+                rows = result.all()
+            else:
+                transaction_id = None
+                if invoice_payload:
+                    transaction_id = await self.session.scalar(complete_pending)
+                if transaction_id is None:
+                    transaction_id = await self.session.scalar(insert_transaction())
+                rows = []
+                if transaction_id is not None:
+                    result = await self.session.execute(
+                        insert(WonGift).returning(WonGift.id, WonGift.transaction_id),
+                        [
+                            {"user_id": user_id, "gift_id": gift_id, "transaction_id": transaction_id}
+                            for gift_id in gift_ids
+                        ]
+                    )
+                    rows = result.all()
+            
+            if not rows:
+                await self.session.rollback()
+                return None
+            
+            await GiftDeliveryService(self.session).enqueue_transaction(rows[0].transaction_id)
+            await self.session.commit()
+            return {
+                "transaction_id": rows[0].transaction_id,
+                "won_gift_ids": [row.id for row in rows]
+            }
+        except IntegrityError:
+            # A concurrent settlement of the same charge completed another pending row first
+            await self.session.rollback()
+            if await self.session.scalar(select(Transaction.id).where(Transaction.transaction_id == charge_id)):
+                return None
+            raise
+        except Exception:
+            await self.session.rollback()
+            raise
+    
+    async def record_refund(
+        self,
+        user_id: int,
+        charge_id: str,
+        amount: int,
+        invoice_payload: Optional[str] = None
+    ) -> Optional[int]:
+        """Mark a refunded charge, taking over its pre-checkout row when there is one.
+
+        Returns the transaction id, or None when the charge is already recorded.
+        """
+        refunded = TransactionStatus.REFUNDED.value
+        pending = aliased(Transaction)
+        try:
+            transaction_id = None
+            if invoice_payload:
+                transaction_id = await self.session.scalar(
+                    update(Transaction)
+                    .where(
+                        Transaction.id == (
+                            select(pending.id)
+                            .where(
+                                pending.user_id == user_id,
+                                pending.invoice_payload == invoice_payload,
+                                pending.amount == amount,
+                                pending.status == TransactionStatus.PENDING.value
+                            )
+                            .order_by(pending.id.asc())
+                            .limit(1)
+                            .scalar_subquery()
+                        ),
+                        ~exists().where(Transaction.transaction_id == charge_id)
+                    )
+                    .values(transaction_id=charge_id, status=refunded)
+                    .returning(Transaction.id)
+                )
+            if transaction_id is None:
+                transaction_id = await self.session.scalar(
+                    dialect_insert(Transaction)
+                    .values(
+                        user_id=user_id,
+                        transaction_id=charge_id,
+                        invoice_payload=invoice_payload,
+                        amount=amount,
+                        status=refunded
+                    )
+                    .on_conflict_do_nothing(index_elements=[Transaction.transaction_id])
+                    .returning(Transaction.id)
+                )
+            await self.session.commit()
+            return transaction_id
+        except Exception:
+            await self.session.rollback()
+            raise
+    
+    async def get_settlement(self, charge_id: str) -> Optional[Dict]:
+        """Read back how an already settled charge was paid out"""
+        result = await self.session.execute(
+            select(
+                WonGift.id,
+                WonGift.transaction_id,
+                Gift.id.label("gift_id"),
+                Gift.gift_id.label("telegram_gift_id"),
+                Gift.name
+            )
+            .join(Transaction, WonGift.transaction_id == Transaction.id)
+            .join(Gift, WonGift.gift_id == Gift.id)
+            .where(Transaction.transaction_id == charge_id)
+            .order_by(WonGift.id.asc())
+        )
+        rows = result.all()
+        if not rows:
+            return None
+        
+        return {
+            "transaction_id": rows[0].transaction_id,
+            "won_gift_ids": [row.id for row in rows],
+            "gifts": [
+                {"id": row.gift_id, "gift_id": row.telegram_gift_id, "name": row.name}
+                for row in rows
+            ]
+        }
+    
+    async def process_spin_payment(
+        self,
+        user_id: int,
+        charge_id: str,
+        amount: int,
+        invoice_payload: Optional[str] = None
+    ) -> Optional[Dict]:
+        """Idempotently settle a successful payment for one or more spins.
+
+        When the invoice payload names a pending spin session, its precomputed
+        outcome is used and the session is completed in the same transaction;
+        otherwise the gifts are drawn now. Returns None when there is no gift
+        to draw or the amount matches no spin pack. Redelivered charges come
+        back with ``duplicate=True`` and the original payout, without writes.
+        """
+        settlement = await payment_dedup.get(charge_id)
+        if settlement:
+            return {**settlement, "duplicate": True}
+        
+        spin_count = self.spins_for_amount(amount)
+        if not spin_count:
+            print(f"Payment {charge_id} of {amount} Stars matches no spin pack")
+            return None
+        
+        if not payment_dedup.claim(charge_id):
+            return {"duplicate": True}
+        
+        try:
+            gift_ids = None
+            claimed_session = None
+            if invoice_payload:
+                claimed_session = await self.claim_spin_session(invoice_payload, user_id, spin_count)
+                if claimed_session:
+                    gift_ids = claimed_session.result_gift_ids
+            
+            # Gifts taken by this call; their reservation rolls back with the transaction if nothing
+            # gets settled, but this process's copy of the stock has to be put back by hand
+            if gift_ids:
+                won_gifts, drawn_gifts = await self.load_session_gifts(gift_ids)
+            else:
+                won_gifts = drawn_gifts = await self.reserve_draw(lambda: gift_sampler.draw_many(spin_count))
+            
+            if not won_gifts:
+                await self.session.rollback()
+                return None
+            
+            try:
+                settlement = await self.settle_spin_payment(
+                    user_id=user_id,
+                    charge_id=charge_id,
+                    amount=amount,
+                    gift_ids=[gift.id for gift in won_gifts],
+                    invoice_payload=invoice_payload
+                )
+            except Exception:
+                gift_inventory.put_back([gift.id for gift in drawn_gifts])
+                raise
+            
+            if settlement is None:
+                gift_inventory.put_back([gift.id for gift in drawn_gifts])
+                settlement = await self.get_settlement(charge_id)
+                if settlement:
+                    await payment_dedup.remember(charge_id, settlement)
+                return {**(settlement or {}), "duplicate": True}
+            
+            for gift_id, count in Counter(gift.id for gift in won_gifts).items():
+                gift_win_counter.record(gift_id, count)
+            
+            settlement["gifts"] = [
+                {"id": gift.id, "gift_id": gift.gift_id, "name": gift.name}
+                for gift in won_gifts
+            ]
+            if claimed_session:
+                settlement["spin_session"] = {
+                    "session_id": invoice_payload,
+                    "status": "completed",
+                    "spins": spin_count,
+                    "result_gift_ids": gift_ids,
+                    "server_seed": claimed_session.server_seed
+                }
+            await payment_dedup.remember(charge_id, settlement)
+            return {**settlement, "duplicate": False}
+        except Exception:
+            await self.session.rollback()
+            raise
+        finally:
+            payment_dedup.release(charge_id)
@@ -0,0 +1,69 @@
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from typing import Dict, Optional, Set
+import json
+
+class PaymentDeduplicator:
+    """Remembers settled telegram_payment_charge_ids.
+
+    Lookups go to a bounded in-process LRU first and then to Redis when
+    REDIS_URL is configured. The unique transaction_id on the ledger is the
+    final guard for anything both caches have missed.
+    """
+
+    key_prefix = "payments:settled:"
+
+    def __init__(self, maxsize: int = 10000):
+        self._settled = LRUCache(maxsize=maxsize)
+        self._in_flight: Set[str] = set()
+
+    async def get(self, charge_id: str) -> Optional[Dict]:
+        settlement = self._settled.get(charge_id)
+        if settlement is not None:
+            return settlement
+
+        client = get_redis()
+        if client is None:
+            return None
+
+        try:
+            cached = await client.get(self.key_prefix + charge_id)
+        except Exception as e:
+            print(f"Error reading payment dedup cache: {e}")
+            return None
+
+        if cached is None:
+            return None
+
+        settlement = json.loads(cached)
+        self._settled.set(charge_id, settlement)
+        return settlement
+
+    async def remember(self, charge_id: str, settlement: Dict):
+        self._settled.set(charge_id, settlement)
+
+        client = get_redis()
+        if client is None:
+            return
+
+        try:
+            await client.set(
+                self.key_prefix + charge_id,
+                json.dumps(settlement),
+                ex=settings.PAYMENT_DEDUP_TTL
+            )
+        except Exception as e:
+            print(f"Error writing payment dedup cache: {e}")
+
+    def claim(self, charge_id: str) -> bool:
+        """Reserve a charge for processing; False if this process is already on it"""
+        if charge_id in self._in_flight:
+            return False
+        self._in_flight.add(charge_id)
+        return True
+
+    def release(self, charge_id: str):
+        self._in_flight.discard(charge_id)
+
+payment_dedup = PaymentDeduplicator(maxsize=settings.PAYMENT_DEDUP_CACHE_SIZE)
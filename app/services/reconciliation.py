@@ -0,0 +1,293 @@
+"""Payment reconciliation between transactions and won gifts.
+
+    python -m app.services.reconciliation
+    python -m app.services.reconciliation --repair --stale-minutes 30
+
+Streams ``transactions`` ordered by id and the per-transaction WonGift counts
+ordered by transaction id through server-side cursors, and merge anti-joins
+the two streams. Memory stays bounded by the chunk size and the sample
+limit however many rows the tables hold.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, case, exists
+from sqlalchemy.orm import aliased
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.database import Transaction, WonGift, TransactionStatus
+from app.services.gift_counter import gift_win_counter
+from app.services.gift_delivery import GiftDeliveryService
+from app.services.gift_inventory import gift_inventory
+from app.services.gift_sampler import gift_sampler
+from app.services.payment import PaymentService
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+
+SAMPLE_LIMIT = 100
+
+def completed_counterpart():
+    """Whether a pending ``Transaction`` row was paid through another, completed row.
+
+    Settlement used to insert its own row keyed by the charge id and leave
+    the pre-checkout row pending. Such a leftover is the row just before a
+    completed one for the same user and invoice payload, so every completed
+    row covers at most one pending row. Rows without a payload never match.
+    """
+    completed = aliased(Transaction)
+    between = aliased(Transaction)
+    return exists().where(
+        completed.user_id == Transaction.user_id,
+        completed.invoice_payload == Transaction.invoice_payload,
+        completed.id > Transaction.id,
+        completed.status == TransactionStatus.COMPLETED.value,
+        ~exists().where(
+            between.user_id == Transaction.user_id,
+            between.invoice_payload == Transaction.invoice_payload,
+            between.id > Transaction.id,
+            between.id < completed.id
+        ).correlate_except(between)
+    )
+
+class ReconciliationReport:
+    def __init__(self):
+        self.transactions_scanned = 0
+        self.won_gift_groups_scanned = 0
+        self.issues: Dict[str, int] = Counter()
+        self.samples: Dict[str, List[int]] = {}
+        self.repaired: Dict[str, int] = Counter()
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    def add_issue(self, kind: str, transaction_id: int):
+        self.issues[kind] += 1
+        samples = self.samples.setdefault(kind, [])
+        if len(samples) < SAMPLE_LIMIT:
+            samples.append(transaction_id)
+
+    def to_dict(self) -> Dict:
+        return {
+            "transactions_scanned": self.transactions_scanned,
+            "won_gift_groups_scanned": self.won_gift_groups_scanned,
+            "issues": dict(self.issues),
+            "samples": self.samples,
+            "repaired": dict(self.repaired),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+class ReconciliationService:
+    STUCK_PENDING = "stuck_pending"
+    PENDING_WITH_COMPLETED_COUNTERPART = "pending_with_completed_counterpart"
+    COMPLETED_WITHOUT_WON_GIFTS = "completed_without_won_gifts"
+    WON_GIFTS_ON_INCOMPLETE = "won_gifts_on_incomplete_transaction"
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def stream_transactions(self, chunk_size: int) -> AsyncIterator[Tuple]:
+        result = await self.session.stream(
+            select(
+                Transaction.id,
+                Transaction.user_id,
+                Transaction.amount,
+                Transaction.status,
+                Transaction.created_at,
+                # Only evaluated for the few pending rows, one index probe each
+                case(
+                    (Transaction.status == TransactionStatus.PENDING.value, completed_counterpart()),
+                    else_=False
+                ).label("has_completed_counterpart")
+            )
+            .order_by(Transaction.id.asc())
+            .execution_options(yield_per=chunk_size)
+        )
+        async for row in result:
+            yield row
+
+    async def stream_won_gift_counts(self, chunk_size: int) -> AsyncIterator[Tuple]:
+        result = await self.session.stream(
+            select(WonGift.transaction_id, func.count(WonGift.id))
+            .where(WonGift.transaction_id.isnot(None))
+            .group_by(WonGift.transaction_id)
+            .order_by(WonGift.transaction_id.asc())
+            .execution_options(yield_per=chunk_size)
+        )
+        async for row in result:
+            yield row
+
+    async def mark_transactions_failed(self, transaction_ids: List[int]) -> int:
+        """Fail stuck pending transactions; a concurrent settlement wins the race.
+
+        Rows that were paid through a completed counterpart are left alone.
+        """
+        try:
+            result = await self.session.execute(
+                update(Transaction)
+                .where(
+                    Transaction.id.in_(transaction_ids),
+                    Transaction.status == TransactionStatus.PENDING.value,
+                    ~completed_counterpart()
+                )
+                .values(status=TransactionStatus.FAILED.value)
+            )
+            await self.session.commit()
+            return result.rowcount
+        except Exception as e:
+            await self.session.rollback()
+            print(f"Error failing stuck transactions: {e}")
+            return 0
+
+    async def award_missing_gifts(self, transaction_id: int, user_id: int, amount: int) -> bool:
+        """Draw and record the gifts a completed payment never got, and queue their delivery"""
+        spin_count = PaymentService.spins_for_amount(amount)
+        if not spin_count:
+            return False
+
+        won_gifts = await gift_sampler.draw_many(spin_count)
+        if not won_gifts:
+            return False
+
+        try:
+            # Re-check under the row lock so a concurrent settlement or repair can't double award
+            status = await self.session.scalar(
+                select(Transaction.status)
+                .where(Transaction.id == transaction_id)
+                .with_for_update()
+            )
+            has_won_gifts = await self.session.scalar(
+                select(func.count(WonGift.id)).where(WonGift.transaction_id == transaction_id)
+            )
+            if status != TransactionStatus.COMPLETED.value or has_won_gifts:
+                await self.session.rollback()
+                gift_inventory.put_back([gift.id for gift in won_gifts])
+                return False
+
+            if not await gift_inventory.reserve(self.session, [gift.id for gift in won_gifts]):
+                # Sold out by another worker; the next run draws again
+                await self.session.rollback()
+                return False
+
+            self.session.add_all([
+                WonGift(user_id=user_id, gift_id=gift.id, transaction_id=transaction_id)
+                for gift in won_gifts
+            ])
+            await self.session.flush()
+            await GiftDeliveryService(self.session).enqueue_transaction(transaction_id)
+            await self.session.commit()
+        except Exception as e:
+            await self.session.rollback()
+            gift_inventory.put_back([gift.id for gift in won_gifts])
+            print(f"Error awarding missing gifts for transaction {transaction_id}: {e}")
+            return False
+
+        for gift_id, count in Counter(gift.id for gift in won_gifts).items():
+            gift_win_counter.record(gift_id, count)
+        return True
+
+async def _next(iterator: AsyncIterator) -> Optional[Tuple]:
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def reconcile_payments(
+    repair: bool = False,
+    stale_after: timedelta = timedelta(minutes=60),
+    chunk_size: int = 10000
+) -> ReconciliationReport:
+    """Merge anti-join of transactions against their WonGift counts.
+
+    Each stream has its own connection so both cursors stay open side by
+    side; repairs go through a third session in batches of ``chunk_size``.
+    """
+    report = ReconciliationReport()
+    stale_before = datetime.utcnow() - stale_after
+    stuck: List[int] = []
+    missing: List[Tuple[int, int, int]] = []
+
+    async def apply_repairs():
+        if stuck:
+            async with async_session_maker() as session:
+                report.repaired[ReconciliationService.STUCK_PENDING] += await ReconciliationService(session).mark_transactions_failed(stuck)
+            stuck.clear()
+        for transaction_id, user_id, amount in missing:
+            async with async_session_maker() as session:
+                if await ReconciliationService(session).award_missing_gifts(transaction_id, user_id, amount):
+                    report.repaired[ReconciliationService.COMPLETED_WITHOUT_WON_GIFTS] += 1
+        missing.clear()
+
+    async with async_session_maker() as transactions_session, async_session_maker() as won_gifts_session:
+        transactions = ReconciliationService(transactions_session).stream_transactions(chunk_size)
+        won_gift_counts = ReconciliationService(won_gifts_session).stream_won_gift_counts(chunk_size)
+
+        won_gift_group = await _next(won_gift_counts)
+        async for transaction in transactions:
+            report.transactions_scanned += 1
+
+            # Groups behind the current transaction have no transaction row of their own
+            while won_gift_group is not None and won_gift_group[0] < transaction.id:
+                report.won_gift_groups_scanned += 1
+                won_gift_group = await _next(won_gift_counts)
+
+            won_gifts = 0
+            if won_gift_group is not None and won_gift_group[0] == transaction.id:
+                won_gifts = won_gift_group[1]
+                report.won_gift_groups_scanned += 1
+                won_gift_group = await _next(won_gift_counts)
+
+            created_at = transaction.created_at.replace(tzinfo=None) if transaction.created_at else None
+            if transaction.status == TransactionStatus.COMPLETED.value:
+                if not won_gifts:
+                    report.add_issue(ReconciliationService.COMPLETED_WITHOUT_WON_GIFTS, transaction.id)
+                    if repair:
+                        missing.append((transaction.id, transaction.user_id, transaction.amount))
+            else:
+                if won_gifts:
+                    report.add_issue(ReconciliationService.WON_GIFTS_ON_INCOMPLETE, transaction.id)
+                if transaction.status == TransactionStatus.PENDING.value and transaction.has_completed_counterpart:
+                    # Paid, just through another row; failing it would fail a paid purchase
+                    report.add_issue(ReconciliationService.PENDING_WITH_COMPLETED_COUNTERPART, transaction.id)
+                elif transaction.status == TransactionStatus.PENDING.value and created_at and created_at < stale_before:
+                    report.add_issue(ReconciliationService.STUCK_PENDING, transaction.id)
+                    if repair and not won_gifts:
+                        stuck.append(transaction.id)
+
+            if repair and len(stuck) + len(missing) >= chunk_size:
+                await apply_repairs()
+
+    if repair:
+        await apply_repairs()
+
+    report.finished_at = datetime.utcnow()
+    return report
+
+def print_report(report: ReconciliationReport):
+    print(f"🔍 Scanned {report.transactions_scanned:,} transactions and {report.won_gift_groups_scanned:,} won gift groups")
+    if not report.issues:
+        print("✅ No issues found")
+    for kind, count in report.issues.items():
+        print(f"⚠️ {kind}: {count:,} (e.g. transaction ids {report.samples[kind][:10]})")
+    for kind, count in report.repaired.items():
+        print(f"🔧 repaired {kind}: {count:,}")
+    print(f"⏱️ Took {(report.finished_at - report.started_at).total_seconds():.1f}s")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Reconcile payments against won gifts")
+    parser.add_argument("--repair", action="store_true", help="fail stuck pending transactions and award missing gifts")
+    parser.add_argument("--stale-minutes", type=int, default=settings.RECONCILIATION_STALE_PENDING_MINUTES)
+    parser.add_argument("--chunk-size", type=int, default=settings.RECONCILIATION_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    report = await reconcile_payments(
+        repair=args.repair,
+        stale_after=timedelta(minutes=args.stale_minutes),
+        chunk_size=args.chunk_size
+    )
+    print_report(report)
+
+    await gift_win_counter.flush()
+
+if __name__ == "__main__":
+    asyncio.run(main())
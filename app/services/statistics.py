@@ -1,69 +1,60 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, desc
-from app.models.database import User, Transaction, WonGift, Gift, Broadcast, TransactionStatus
+from sqlalchemy import select, func, or_, true
+from app.models.database import (
+    User, Transaction, WonGift, Gift, Broadcast, TransactionStatus,
+    DailyUserStats, DailyRevenueStats, DailyGiftStats
+)
+from app.services.stats_rollup import StatsRollupService, day_start, within
+from app.services.gift_counter import gift_win_counter
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import io
 import base64
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import os
 from app.core.config import settings
+from app.core.cache import AsyncTTLCache
+from app.core.database import async_session_maker
+
+# Shared by the admin panel and GET /users/analytics: at most one computation per key per TTL
+stats_cache = AsyncTTLCache(ttl=settings.STATS_CACHE_TTL, stale_ttl=settings.STATS_CACHE_STALE_TTL)
+
+def today_bounds() -> Tuple[datetime, datetime]:
+    """Start and end of the current UTC day"""
+    start = day_start(datetime.utcnow().date())
+    return start, start + timedelta(days=1)
+
+def add_stats(rolled: Dict, live: Dict) -> Dict:
+    return {key: (rolled.get(key) or 0) + (live.get(key) or 0) for key in live}
+
+async def compute_in_own_session(method: str) -> Dict:
+    """Cached stats outlive the request that computed them, so they get their own session"""
+    async with async_session_maker() as session:
+        return await getattr(StatisticsService(session), method)()
 
 class StatisticsService:
+    """Dashboard stats from the daily rollups plus the raw rows after them.
+
+    Days before the rollup watermark come from the daily_* tables, one row
+    per day; rows from the watermark on are read with index range scans.
+    Until the rollup job first runs, everything is read live.
+    
+    ``get_*_stats`` serve from ``stats_cache``; ``compute_*_stats`` always
+    hit the database.
+    """
+    
     def __init__(self, session: AsyncSession):
         self.session = session
     
+    async def get_live_from(self) -> Optional[datetime]:
+        watermark = await StatsRollupService(self.session).get_watermark()
+        return day_start(watermark) if watermark else None
+    
     async def get_user_stats(self) -> Dict:
         try:
-            total_users = await self.session.scalar(select(func.count(User.id)))
-            
-            today = datetime.utcnow().date()
-            week_ago = today - timedelta(days=7)
-            month_ago = today - timedelta(days=30)
-            
-            new_users_today = await self.session.scalar(
-                select(func.count(User.id)).where(
-                    func.date(User.created_at) == today
-                )
-            )
-            
-            new_users_week = await self.session.scalar(
-                select(func.count(User.id)).where(
-                    func.date(User.created_at) >= week_ago
-                )
-            )
-            
-            new_users_month = await self.session.scalar(
-                select(func.count(User.id)).where(
-                    func.date(User.created_at) >= month_ago
-                )
-            )
-            
-            active_users_today = await self.session.scalar(
-                select(func.count(User.id)).where(
-                    func.date(User.last_activity) == today
-                )
-            )
-            
-            premium_users = await self.session.scalar(
-                select(func.count(User.id)).where(User.is_premium == True)
-            )
-            
-            blocked_users = await self.session.scalar(
-                select(func.count(User.id)).where(User.is_blocked == True)
-            )
-            
-            return {
-                "total_users": total_users or 0,
-                "new_users_today": new_users_today or 0,
-                "new_users_week": new_users_week or 0,
-                "new_users_month": new_users_month or 0,
-                "active_users_today": active_users_today or 0,
-                "premium_users": premium_users or 0,
-                "blocked_users": blocked_users or 0
-            }
+            return await stats_cache.get_or_compute("user_stats", lambda: compute_in_own_session("compute_user_stats"))
         except Exception as e:
             print(f"Error getting user stats: {e}")
             return {
@@ -78,57 +69,7 @@ class StatisticsService:
     
     async def get_revenue_stats(self) -> Dict:
         try:
-            total_revenue = await self.session.scalar(
-                select(func.sum(Transaction.amount)).where(
-                    Transaction.status == TransactionStatus.COMPLETED.value
-                )
-            )
-            
-            today = datetime.utcnow().date()
-            week_ago = today - timedelta(days=7)
-            month_ago = today - timedelta(days=30)
-            
-            revenue_today = await self.session.scalar(
-                select(func.sum(Transaction.amount)).where(
-                    and_(
-                        Transaction.status == TransactionStatus.COMPLETED.value,
-                        func.date(Transaction.completed_at) == today
-                    )
-                )
-            )
-            
-            revenue_week = await self.session.scalar(
-                select(func.sum(Transaction.amount)).where(
-                    and_(
-                        Transaction.status == TransactionStatus.COMPLETED.value,
-                        func.date(Transaction.completed_at) >= week_ago
-                    )
-                )
-            )
-            
-            revenue_month = await self.session.scalar(
-                select(func.sum(Transaction.amount)).where(
-                    and_(
-                        Transaction.status == TransactionStatus.COMPLETED.value,
-                        func.date(Transaction.completed_at) >= month_ago
-                    )
-                )
-            )
-            
-            total_transactions = await self.session.scalar(
-                select(func.count(Transaction.id)).where(
-                    Transaction.status == TransactionStatus.COMPLETED.value
-                )
-            )
-            
-            return {
-                "total_revenue": total_revenue or 0,
-                "revenue_today": revenue_today or 0,
-                "revenue_week": revenue_week or 0,
-                "revenue_month": revenue_month or 0,
-                "total_transactions": total_transactions or 0,
-                "average_transaction": (total_revenue / total_transactions) if total_transactions and total_revenue else 0
-            }
+            return await stats_cache.get_or_compute("revenue_stats", lambda: compute_in_own_session("compute_revenue_stats"))
         except Exception as e:
             print(f"Error getting revenue stats: {e}")
             return {
@@ -142,35 +83,7 @@ class StatisticsService:
     
     async def get_gift_stats(self) -> Dict:
         try:
-            total_gifts_won = await self.session.scalar(select(func.count(WonGift.id)))
-            
-            gifts_today = await self.session.scalar(
-                select(func.count(WonGift.id)).where(
-                    func.date(WonGift.won_at) == datetime.utcnow().date()
-                )
-            )
-            
-            most_popular_gifts = await self.session.execute(
-                select(Gift.name, func.count(WonGift.id).label('count'))
-                .join(WonGift)
-                .group_by(Gift.id, Gift.name)
-                .order_by(desc('count'))
-                .limit(5)
-            )
-            
-            popular_gifts = [{"name": row.name, "count": row.count} for row in most_popular_gifts]
-            
-            total_gift_value = await self.session.scalar(
-                select(func.sum(Gift.star_count))
-                .join(WonGift)
-            )
-            
-            return {
-                "total_gifts_won": total_gifts_won or 0,
-                "gifts_today": gifts_today or 0,
-                "most_popular_gifts": popular_gifts,
-                "total_gift_value": total_gift_value or 0
-            }
+            return await stats_cache.get_or_compute("gift_stats", lambda: compute_in_own_session("compute_gift_stats"))
         except Exception as e:
             print(f"Error getting gift stats: {e}")
             return {
@@ -180,21 +93,168 @@ class StatisticsService:
                 "total_gift_value": 0
             }
     
+    async def get_top_gifts(self, limit: int = 5) -> List[Dict]:
+        """Most won gifts by their exact total_won, unflushed wins included; not cached"""
+        try:
+            totals = await gift_win_counter.get_totals(self.session)
+            result = await self.session.execute(select(Gift.id, Gift.name))
+            names = dict(result.all())
+            return [
+                {"name": names[gift_id], "count": count}
+                for gift_id, count in sorted(totals.items(), key=lambda item: item[1], reverse=True)
+                if count and gift_id in names
+            ][:limit]
+        except Exception as e:
+            print(f"Error getting top gifts: {e}")
+            return []
+    
+    async def compute_user_stats(self) -> Dict:
+        """User metrics from the rollups plus one index-driven query on users"""
+        today, tomorrow = today_bounds()
+        week_ago = today - timedelta(days=7)
+        month_ago = today - timedelta(days=30)
+        live_from = await self.get_live_from()
+        
+        rolled = await self.session.execute(
+            select(
+                func.sum(DailyUserStats.new_users).label("total_users"),
+                func.sum(DailyUserStats.new_users).filter(DailyUserStats.day >= week_ago.date()).label("new_users_week"),
+                func.sum(DailyUserStats.new_users).filter(DailyUserStats.day >= month_ago.date()).label("new_users_month")
+            )
+        )
+        
+        # Rows past the watermark, plus the premium/blocked/active ones, each behind its own index
+        is_live = User.created_at >= live_from if live_from else true()
+        live = await self.session.execute(
+            select(
+                func.count(User.id).filter(is_live).label("total_users"),
+                func.count(User.id).filter(is_live, within(User.created_at, today, tomorrow)).label("new_users_today"),
+                func.count(User.id).filter(is_live, within(User.created_at, week_ago, tomorrow)).label("new_users_week"),
+                func.count(User.id).filter(is_live, within(User.created_at, month_ago, tomorrow)).label("new_users_month"),
+                func.count(User.id).filter(within(User.last_activity, today, tomorrow)).label("active_users_today"),
+                func.count(User.id).filter(User.is_premium == True).label("premium_users"),
+                func.count(User.id).filter(User.is_blocked == True).label("blocked_users")
+            )
+            .where(
+                or_(
+                    is_live,
+                    User.last_activity >= today,
+                    User.is_premium == True,
+                    User.is_blocked == True
+                )
+            )
+        )
+        return add_stats(rolled.one()._mapping, live.one()._mapping)
+    
+    async def compute_revenue_stats(self) -> Dict:
+        """Revenue metrics from the rollups plus the completed transactions after them"""
+        today, tomorrow = today_bounds()
+        week_ago = today - timedelta(days=7)
+        month_ago = today - timedelta(days=30)
+        live_from = await self.get_live_from()
+        
+        rolled = await self.session.execute(
+            select(
+                func.sum(DailyRevenueStats.revenue).label("total_revenue"),
+                func.sum(DailyRevenueStats.revenue).filter(DailyRevenueStats.day >= week_ago.date()).label("revenue_week"),
+                func.sum(DailyRevenueStats.revenue).filter(DailyRevenueStats.day >= month_ago.date()).label("revenue_month"),
+                func.sum(DailyRevenueStats.transactions).label("total_transactions")
+            )
+        )
+        
+        live = select(
+            func.sum(Transaction.amount).label("total_revenue"),
+            func.sum(Transaction.amount).filter(within(Transaction.completed_at, today, tomorrow)).label("revenue_today"),
+            func.sum(Transaction.amount).filter(within(Transaction.completed_at, week_ago, tomorrow)).label("revenue_week"),
+            func.sum(Transaction.amount).filter(within(Transaction.completed_at, month_ago, tomorrow)).label("revenue_month"),
+            func.count(Transaction.id).label("total_transactions")
+        ).where(Transaction.status == TransactionStatus.COMPLETED.value)
+        if live_from:
+            live = live.where(Transaction.completed_at >= live_from)
+        
+        stats = add_stats(rolled.one()._mapping, (await self.session.execute(live)).one()._mapping)
+        
+        total_revenue = stats["total_revenue"]
+        total_transactions = stats["total_transactions"]
+        stats["average_transaction"] = (total_revenue / total_transactions) if total_transactions and total_revenue else 0
+        return stats
+    
+    async def compute_gift_stats(self) -> Dict:
+        """Per-gift win counts from the rollups plus the wins after them.
+
+        There are only as many groups as gifts in the catalog, so the totals
+        and the top five are folded together here rather than in more queries.
+        """
+        today, tomorrow = today_bounds()
+        live_from = await self.get_live_from()
+        
+        wins: Dict[int, int] = {}
+        wins_today: Dict[int, int] = {}
+        
+        rolled = await self.session.execute(
+            select(DailyGiftStats.gift_id, func.sum(DailyGiftStats.wins))
+            .group_by(DailyGiftStats.gift_id)
+        )
+        for gift_id, count in rolled:
+            wins[gift_id] = count
+        
+        live = select(
+            WonGift.gift_id,
+            func.count(WonGift.id),
+            func.count(WonGift.id).filter(within(WonGift.won_at, today, tomorrow))
+        ).group_by(WonGift.gift_id)
+        if live_from:
+            live = live.where(WonGift.won_at >= live_from)
+        for gift_id, count, count_today in await self.session.execute(live):
+            wins[gift_id] = wins.get(gift_id, 0) + count
+            wins_today[gift_id] = count_today
+        
+        gifts = {}
+        if wins:
+            result = await self.session.execute(
+                select(Gift.id, Gift.name, Gift.star_count).where(Gift.id.in_(wins.keys()))
+            )
+            gifts = {row.id: row for row in result}
+        
+        popular_gifts = [
+            {"name": gifts[gift_id].name, "count": count}
+            for gift_id, count in sorted(wins.items(), key=lambda item: item[1], reverse=True)
+            if gift_id in gifts
+        ][:5]
+        
+        return {
+            "total_gifts_won": sum(wins.values()),
+            "gifts_today": sum(wins_today.values()),
+            "most_popular_gifts": popular_gifts,
+            "total_gift_value": sum(count * gifts[gift_id].star_count for gift_id, count in wins.items() if gift_id in gifts)
+        }
+    
     async def generate_user_growth_chart(self) -> Optional[str]:
         try:
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+            today, tomorrow = today_bounds()
+            thirty_days_ago = today - timedelta(days=30)
+            live_from = max(thirty_days_ago, await self.get_live_from() or thirty_days_ago)
             
-            result = await self.session.execute(
+            rolled = await self.session.execute(
+                select(DailyUserStats.day, DailyUserStats.new_users)
+                .where(
+                    DailyUserStats.day >= thirty_days_ago.date(),
+                    DailyUserStats.day < live_from.date(),
+                    DailyUserStats.new_users > 0
+                )
+                .order_by(DailyUserStats.day)
+            )
+            live = await self.session.execute(
                 select(
                     func.date(User.created_at).label('date'),
                     func.count(User.id).label('count')
                 )
-                .where(User.created_at >= thirty_days_ago)
+                .where(within(User.created_at, live_from, tomorrow))
                 .group_by(func.date(User.created_at))
                 .order_by('date')
             )
             
-            data = [(row.date, row.count) for row in result]
+            data = [(row.day, row.new_users) for row in rolled] + [(row.date, row.count) for row in live]
             
             if not data:
                 return None
@@ -203,6 +263,7 @@ class StatisticsService:
             os.makedirs(settings.CHARTS_DIR, exist_ok=True)
             
             df = pd.DataFrame(data, columns=['date', 'count'])
+            df['date'] = pd.to_datetime(df['date'])
             df['cumulative'] = df['count'].cumsum()
             
             plt.figure(figsize=(12, 10))
@@ -236,25 +297,34 @@ class StatisticsService:
     
     async def generate_revenue_chart(self) -> Optional[str]:
         try:
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+            today, tomorrow = today_bounds()
+            thirty_days_ago = today - timedelta(days=30)
+            live_from = max(thirty_days_ago, await self.get_live_from() or thirty_days_ago)
             
-            result = await self.session.execute(
+            rolled = await self.session.execute(
+                select(DailyRevenueStats.day, DailyRevenueStats.revenue, DailyRevenueStats.transactions)
+                .where(
+                    DailyRevenueStats.day >= thirty_days_ago.date(),
+                    DailyRevenueStats.day < live_from.date(),
+                    DailyRevenueStats.transactions > 0
+                )
+                .order_by(DailyRevenueStats.day)
+            )
+            live = await self.session.execute(
                 select(
                     func.date(Transaction.completed_at).label('date'),
                     func.sum(Transaction.amount).label('revenue'),
                     func.count(Transaction.id).label('transactions')
                 )
                 .where(
-                    and_(
-                        Transaction.status == TransactionStatus.COMPLETED.value,
-                        Transaction.completed_at >= thirty_days_ago
-                    )
+                    Transaction.status == TransactionStatus.COMPLETED.value,
+                    within(Transaction.completed_at, live_from, tomorrow)
                 )
                 .group_by(func.date(Transaction.completed_at))
                 .order_by('date')
             )
             
-            data = [(row.date, row.revenue, row.transactions) for row in result]
+            data = [(row.day, row.revenue, row.transactions) for row in rolled] + [(row.date, row.revenue, row.transactions) for row in live]
             
             if not data:
                 return None
@@ -263,6 +333,7 @@ class StatisticsService:
             os.makedirs(settings.CHARTS_DIR, exist_ok=True)
             
             df = pd.DataFrame(data, columns=['date', 'revenue', 'transactions'])
+            df['date'] = pd.to_datetime(df['date'])
             
             plt.figure(figsize=(12, 10))
             
@@ -0,0 +1,217 @@
+"""Admin dashboard statistics benchmark.
+
+    python -m app.services.stats_benchmark --seed --users 1000000 --transactions 10000000
+    python -m app.services.stats_benchmark --runs 5
+    python -m app.services.stats_benchmark --cleanup
+
+Times each uncached ``StatisticsService`` stats computation against the
+per-metric queries it replaced (one round trip and one scan per number
+shown).
+Seeding generates rows server-side with ``generate_series`` and needs
+PostgreSQL; run it against a scratch database, not production. It
+finishes with a rollup pass, like the background job does. Seeded users
+take telegram_ids from ``SEED_TELEGRAM_ID_BASE`` up so ``--cleanup`` can
+remove them with everything hanging off them; it also drops the rollups,
+which the job then rebuilds from the remaining rows.
+"""
+from sqlalchemy import select, func, text
+from app.core.database import async_session_maker, is_postgresql
+from app.models.database import User, Transaction, WonGift, Gift, TransactionStatus
+from app.services.statistics import StatisticsService
+from app.services.stats_rollup import StatsRollupService
+from datetime import datetime, timedelta
+from typing import Dict, List
+import argparse
+import asyncio
+import statistics
+import time
+
+SEED_TELEGRAM_ID_BASE = 9_000_000_000_000
+SEED_CHUNK_SIZE = 500_000
+
+def legacy_queries() -> Dict[str, List]:
+    """The statements each stats method used to run, one after another"""
+    today = datetime.utcnow().date()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    completed = Transaction.status == TransactionStatus.COMPLETED.value
+
+    return {
+        "compute_user_stats": [
+            select(func.count(User.id)),
+            select(func.count(User.id)).where(func.date(User.created_at) == today),
+            select(func.count(User.id)).where(func.date(User.created_at) >= week_ago),
+            select(func.count(User.id)).where(func.date(User.created_at) >= month_ago),
+            select(func.count(User.id)).where(func.date(User.last_activity) == today),
+            select(func.count(User.id)).where(User.is_premium == True),
+            select(func.count(User.id)).where(User.is_blocked == True)
+        ],
+        "compute_revenue_stats": [
+            select(func.sum(Transaction.amount)).where(completed),
+            select(func.sum(Transaction.amount)).where(completed, func.date(Transaction.completed_at) == today),
+            select(func.sum(Transaction.amount)).where(completed, func.date(Transaction.completed_at) >= week_ago),
+            select(func.sum(Transaction.amount)).where(completed, func.date(Transaction.completed_at) >= month_ago),
+            select(func.count(Transaction.id)).where(completed)
+        ],
+        "compute_gift_stats": [
+            select(func.count(WonGift.id)),
+            select(func.count(WonGift.id)).where(func.date(WonGift.won_at) == today),
+            select(Gift.name, func.count(WonGift.id).label("count"))
+            .join(WonGift)
+            .group_by(Gift.id, Gift.name)
+            .order_by(func.count(WonGift.id).desc())
+            .limit(5),
+            select(func.sum(Gift.star_count)).join(WonGift)
+        ]
+    }
+
+async def run_legacy(statements: List):
+    async with async_session_maker() as session:
+        for statement in statements:
+            result = await session.execute(statement)
+            result.all()
+
+async def run_current(method: str):
+    async with async_session_maker() as session:
+        await getattr(StatisticsService(session), method)()
+
+async def benchmark(runs: int = 5) -> Dict[str, Dict[str, float]]:
+    """Median wall time in seconds of each stats method, before and after"""
+    report = {}
+    for method, statements in legacy_queries().items():
+        legacy, current = [], []
+        for _ in range(runs):
+            started = time.perf_counter()
+            await run_legacy(statements)
+            legacy.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await run_current(method)
+            current.append(time.perf_counter() - started)
+
+        report[method] = {
+            "queries_before": len(statements),
+            "before": statistics.median(legacy),
+            "after": statistics.median(current)
+        }
+    return report
+
+async def seed(users: int, transactions: int):
+    """Users, transactions (90% completed) and one won gift per completed transaction"""
+    async with async_session_maker() as session:
+        if await session.scalar(select(func.count(User.id)).where(User.telegram_id >= SEED_TELEGRAM_ID_BASE)):
+            raise SystemExit("Seeded rows already exist, run with --cleanup first")
+
+        gift_ids = (await session.execute(select(Gift.id).where(Gift.is_active == True))).scalars().all()
+        if not gift_ids:
+            raise SystemExit("No active gifts to award, start the app once to seed them")
+        first_user_id = (await session.scalar(select(func.max(User.id))) or 0) + 1
+
+    started = time.perf_counter()
+    for start in range(0, users, SEED_CHUNK_SIZE):
+        async with async_session_maker() as session:
+            await session.execute(
+                text("""
+                    INSERT INTO users (id, telegram_id, username, first_name, is_premium, is_bot, is_blocked, created_at, last_activity)
+                    SELECT CAST(:first_user_id AS BIGINT) + g, CAST(:base AS BIGINT) + g, 'bench_' || g, 'Bench',
+                           random() < 0.05, false, random() < 0.01,
+                           now() - random() * interval '365 days', now() - random() * interval '60 days'
+                    FROM generate_series(CAST(:start AS INTEGER), CAST(:stop AS INTEGER)) AS g
+                """),
+                {"first_user_id": first_user_id, "base": SEED_TELEGRAM_ID_BASE, "start": start, "stop": min(start + SEED_CHUNK_SIZE, users) - 1}
+            )
+            await session.commit()
+    print(f"👥 Seeded {users:,} users in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    for start in range(0, transactions, SEED_CHUNK_SIZE):
+        async with async_session_maker() as session:
+            await session.execute(
+                text("""
+                    INSERT INTO transactions (user_id, transaction_id, amount, status, payment_method, created_at, completed_at)
+                    SELECT user_id, 'bench_' || g, amount, status, 'telegram_stars', created_at,
+                           CASE WHEN status = 'completed' THEN created_at + interval '1 minute' END
+                    FROM (
+                        SELECT g,
+                               CAST(:base AS BIGINT) + (g % :users) AS user_id,
+                               (ARRAY[100, 500, 1000])[1 + g % 3] AS amount,
+                               CASE WHEN random() < 0.9 THEN 'completed' WHEN random() < 0.5 THEN 'pending' ELSE 'failed' END AS status,
+                               now() - random() * interval '365 days' AS created_at
+                        FROM generate_series(CAST(:start AS INTEGER), CAST(:stop AS INTEGER)) AS g
+                    ) AS seeded
+                """),
+                {"base": SEED_TELEGRAM_ID_BASE, "users": users, "start": start, "stop": min(start + SEED_CHUNK_SIZE, transactions) - 1}
+            )
+            await session.commit()
+    print(f"💳 Seeded {transactions:,} transactions in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    async with async_session_maker() as session:
+        id_range = (await session.execute(
+            select(func.min(Transaction.id), func.max(Transaction.id))
+            .where(Transaction.user_id >= SEED_TELEGRAM_ID_BASE)
+        )).one()
+    for start in range(id_range[0], id_range[1] + 1, SEED_CHUNK_SIZE):
+        async with async_session_maker() as session:
+            await session.execute(
+                text("""
+                    INSERT INTO won_gifts (user_id, gift_id, transaction_id, won_at, is_claimed)
+                    SELECT user_id, (CAST(:gift_ids AS INTEGER[]))[1 + floor(random() * :gift_count)::int], id, completed_at, false
+                    FROM transactions
+                    WHERE id >= :start AND id < :stop AND status = 'completed' AND user_id >= :base
+                """),
+                {"gift_ids": list(gift_ids), "gift_count": len(gift_ids), "start": start, "stop": start + SEED_CHUNK_SIZE, "base": SEED_TELEGRAM_ID_BASE}
+            )
+            await session.commit()
+    print(f"🎁 Seeded won gifts in {time.perf_counter() - started:.1f}s")
+
+    async with async_session_maker() as session:
+        await session.execute(text("ANALYZE users, transactions, won_gifts"))
+        await session.commit()
+
+    # Roll up the closed days the way the background job would
+    started = time.perf_counter()
+    async with async_session_maker() as session:
+        days = await StatsRollupService(session).advance()
+    print(f"📅 Rolled up {days} days in {time.perf_counter() - started:.1f}s")
+
+async def cleanup():
+    async with async_session_maker() as session:
+        for table in ("won_gifts", "transactions"):
+            await session.execute(text(f"DELETE FROM {table} WHERE user_id >= :base"), {"base": SEED_TELEGRAM_ID_BASE})
+        await session.execute(text("DELETE FROM users WHERE telegram_id >= :base"), {"base": SEED_TELEGRAM_ID_BASE})
+        for table in ("daily_user_stats", "daily_revenue_stats", "daily_gift_stats", "stats_rollup_state"):
+            await session.execute(text(f"DELETE FROM {table}"))
+        await session.commit()
+    print("🧹 Seeded rows removed")
+
+def print_report(report: Dict[str, Dict[str, float]]):
+    for method, timings in report.items():
+        speedup = timings["before"] / timings["after"] if timings["after"] else float("inf")
+        print(
+            f"📊 {method}: {timings['queries_before']} queries {timings['before'] * 1000:,.1f}ms"
+            f" → {timings['after'] * 1000:,.1f}ms ({speedup:.1f}x)"
+        )
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the admin dashboard statistics queries")
+    parser.add_argument("--seed", action="store_true", help="generate benchmark rows first (PostgreSQL only)")
+    parser.add_argument("--cleanup", action="store_true", help="remove generated benchmark rows and exit")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--transactions", type=int, default=10_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if (args.seed or args.cleanup) and not is_postgresql():
+        raise SystemExit("Seeding and cleanup need PostgreSQL")
+
+    if args.cleanup:
+        await cleanup()
+        return
+    if args.seed:
+        await seed(args.users, args.transactions)
+
+    print_report(await benchmark(args.runs))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,48 +1,110 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
+from sqlalchemy import select, update, func, or_, exists, union_all, tuple_
+from sqlalchemy.engine import Row
+from app.core.database import dialect_insert, is_postgresql
 from sqlalchemy.orm import selectinload
 from app.models.database import User, WonGift
+from app.services.activity_tracker import activity_tracker
 from aiogram.types import User as TelegramUser
 from datetime import datetime
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List, Tuple
+import base64
+import json
+
+USER_EXPORT_COLUMNS = [
+    User.telegram_id,
+    User.username,
+    User.first_name,
+    User.last_name,
+    User.language_code,
+    User.is_premium,
+    User.is_bot,
+    User.is_blocked,
+    User.last_activity,
+    User.created_at
+]
+
+def encode_cursor(key: Tuple[datetime, int]) -> str:
+    """Opaque page cursor for a (created_at, id) keyset position"""
+    created_at, user_id = key
+    raw = json.dumps([created_at.isoformat(), user_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, user_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(user_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
 
 class UserService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def get_or_create_user(self, telegram_user: TelegramUser) -> User:
+        """Upsert the user from their Telegram profile in a single statement.
+
+        The row is only rewritten when a profile field actually changed, and
+        concurrent first contacts can't race on the unique telegram_id.
+        """
+        now = datetime.utcnow()
+        profile = {
+            "username": telegram_user.username,
+            "first_name": telegram_user.first_name,
+            "last_name": telegram_user.last_name,
+            "is_premium": getattr(telegram_user, 'is_premium', False),
+            "language_code": getattr(telegram_user, 'language_code', 'en')
+        }
+        
+        upsert = dialect_insert(User).values(
+            telegram_id=telegram_user.id,
+            created_at=now,
+            last_activity=now,
+            is_blocked=False,
+            reminder_sent_at=None,
+            **profile
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={**{field: upsert.excluded[field] for field in profile}, "updated_at": func.now()},
+            where=or_(*(
+                getattr(User, field).is_distinct_from(upsert.excluded[field])
+                for field in profile
+            ))
+        )
+        
         try:
-            result = await self.session.execute(
-                select(User).where(User.telegram_id == telegram_user.id)
-            )
+            if is_postgresql():
+                # Changed or new rows come back from RETURNING, unchanged ones from
+                # the statement's snapshot, so it's one round trip either way
+                upserted = upsert.returning(*User.__table__.c).cte("upserted")
+                result = await self.session.execute(
+                    select(User).from_statement(
+                        union_all(
+                            select(upserted),
+                            select(User.__table__).where(
+                                User.telegram_id == telegram_user.id,
+                                ~exists(select(upserted.c.id))
+                            )
+                        )
+                    )
+                )
+            else:
+                result = await self.session.execute(
+                    select(User).from_statement(upsert.returning(*User.__table__.c))
+                )
             user = result.scalar_one_or_none()
             
-            if not user:
-                user = User(
-                    telegram_id=telegram_user.id,
-                    username=telegram_user.username,
-                    first_name=telegram_user.first_name,
-                    last_name=telegram_user.last_name,
-                    is_premium=getattr(telegram_user, 'is_premium', False),
-                    language_code=getattr(telegram_user, 'language_code', 'en'),
-                    created_at=datetime.utcnow(),
-                    last_activity=datetime.utcnow(),
-                    is_blocked=False,
-                    reminder_sent_at=None
+            if user is None:
+                # Unchanged row, or on PostgreSQL one inserted by a concurrent
+                # first contact after this statement's snapshot was taken
+                user = await self.session.scalar(
+                    select(User).where(User.telegram_id == telegram_user.id)
                 )
-                self.session.add(user)
-                await self.session.commit()
-                await self.session.refresh(user)
-            else:
-                user.username = telegram_user.username
-                user.first_name = telegram_user.first_name
-                user.last_name = telegram_user.last_name
-                user.is_premium = getattr(telegram_user, 'is_premium', False)
-                user.language_code = getattr(telegram_user, 'language_code', 'en')
-                user.last_activity = datetime.utcnow()
-                user.reminder_sent_at = None
-                await self.session.commit()
             
+            await self.session.commit()
+            activity_tracker.touch(user.telegram_id)
             return user
         except Exception as e:
             await self.session.rollback()
@@ -50,19 +112,8 @@ class UserService:
             raise
 
     async def update_last_activity(self, telegram_id: int):
-        try:
-            await self.session.execute(
-                update(User)
-                .where(User.telegram_id == telegram_id)
-                .values(
-                    last_activity=datetime.utcnow(),
-                    reminder_sent_at=None
-                )
-            )
-            await self.session.commit()
-        except Exception as e:
-            await self.session.rollback()
-            print(f"Error updating last activity: {e}")
+        """Record activity; it is flushed in bulk by the activity flush task"""
+        activity_tracker.touch(telegram_id)
 
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         try:
@@ -118,6 +169,43 @@ class UserService:
             print(f"Error getting all users: {e}")
             return []
 
+    async def get_users_page(
+        self,
+        limit: int = 100,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> Tuple[List[User], Optional[Tuple[datetime, int]]]:
+        """Keyset page of users, newest first.
+
+        ``after`` is the (created_at, id) of the last user of the previous
+        page; returns the page and the key to pass for the next one (None on
+        the last page). Served by the (created_at, id) index at any depth.
+        """
+        try:
+            query = select(User).order_by(User.created_at.desc(), User.id.desc()).limit(limit + 1)
+            if after is not None:
+                query = query.where(tuple_(User.created_at, User.id) < tuple_(*after))
+            
+            result = await self.session.execute(query)
+            users = result.scalars().all()
+            
+            if len(users) <= limit:
+                return users, None
+            users = users[:limit]
+            return users, (users[-1].created_at, users[-1].id)
+        except Exception as e:
+            print(f"Error getting users page: {e}")
+            return [], None
+
+    async def stream_users(self, chunk_size: int = 1000) -> AsyncIterator[Row]:
+        """Every user as a plain row, newest first, through a server-side cursor"""
+        result = await self.session.stream(
+            select(*USER_EXPORT_COLUMNS)
+            .order_by(User.created_at.desc(), User.id.desc())
+            .execution_options(yield_per=chunk_size)
+        )
+        async for row in result:
+            yield row
+
     async def block_user(self, telegram_id: int) -> bool:
         try:
             await self.session.execute(
@@ -0,0 +1,271 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import DataError, IntegrityError
+from app.core.config import settings
+from app.core.database import async_session_maker, dialect_insert
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis
+from app.models.database import Transaction, TransactionStatus
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import time
+import uuid
+
+# Atomically moves up to ARGV[1] entries off the queue into a batch list
+# registered in the claims set, so concurrent flushers never share entries
+CLAIM_SCRIPT = """
+local entries = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #entries == 0 then
+    return entries
+end
+redis.call('LTRIM', KEYS[1], #entries, -1)
+redis.call('RPUSH', KEYS[3], unpack(entries))
+redis.call('ZADD', KEYS[2], ARGV[2], KEYS[3])
+return entries
+"""
+
+# Puts claimed batches back at the head of the queue, in order: the batch in
+# ARGV[2] when ARGV[1] is 'batch', otherwise every claim older than ARGV[2]
+REQUEUE_SCRIPT = """
+local function requeue(batch)
+    local entries = redis.call('LRANGE', batch, 0, -1)
+    for i = #entries, 1, -1 do
+        redis.call('LPUSH', KEYS[1], entries[i])
+    end
+    redis.call('DEL', batch)
+    redis.call('ZREM', KEYS[2], batch)
+end
+
+if ARGV[1] == 'batch' then
+    requeue(ARGV[2])
+    return 1
+end
+
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[2])
+for _, batch in ipairs(stale) do
+    requeue(batch)
+end
+return #stale
+"""
+
+class PendingTransactionBuffer:
+    """Write-behind buffer for pending Transaction rows.
+
+    Entries go to a Redis list when REDIS_URL is configured, so they survive a
+    restart; otherwise they are kept in process memory and flushed on
+    shutdown. Flushes are batched INSERT ... ON CONFLICT DO NOTHING, which makes
+    replaying a batch harmless.
+
+    With Redis, each flusher claims its batch atomically into a list of its
+    own and deletes it only once the rows are in; a batch whose flusher died
+    is put back on the queue after ``WRITE_BEHIND_CLAIM_TIMEOUT``. If a
+    batch insert fails the rows are retried one at a time, and rows that can
+    never be inserted (say their user is gone) go to a dead-letter list
+    instead of blocking the queue.
+    """
+
+    redis_key = "writebehind:transactions"
+    claims_key = "writebehind:transactions:claims"
+    dead_letter_key = "writebehind:transactions:dead"
+
+    def __init__(self, batch_size: int = 500, claim_timeout: float = 60.0):
+        self.batch_size = batch_size
+        self.claim_timeout = claim_timeout
+        self._local: Deque[str] = deque()
+        self._dead_letters: Deque[str] = deque(maxlen=10000)
+        self._lock = asyncio.Lock()
+
+    async def enqueue(self, user_id: int, transaction_id: str, amount: int, invoice_payload: Optional[str] = None):
+        entry = json.dumps({
+            "user_id": user_id,
+            "transaction_id": transaction_id,
+            "invoice_payload": invoice_payload,
+            "amount": amount,
+            "created_at": datetime.utcnow().isoformat()
+        })
+
+        client = get_redis()
+        if client is not None:
+            try:
+                await client.rpush(self.redis_key, entry)
+                return
+            except Exception as e:
+                print(f"Error buffering transaction in Redis, keeping it in memory: {e}")
+
+        self._local.append(entry)
+
+    async def depth(self) -> int:
+        depth = len(self._local)
+        client = get_redis()
+        if client is not None:
+            try:
+                depth += await client.llen(self.redis_key)
+            except Exception as e:
+                print(f"Error reading write-behind depth: {e}")
+        return depth
+
+    async def dead_letter_depth(self) -> int:
+        depth = len(self._dead_letters)
+        client = get_redis()
+        if client is not None:
+            try:
+                depth += await client.llen(self.dead_letter_key)
+            except Exception as e:
+                print(f"Error reading write-behind dead letters: {e}")
+        return depth
+
+    async def flush(self) -> int:
+        """Drain the buffer in batches; returns the number of entries handled"""
+        written = 0
+        async with self._lock:
+            await self._requeue_stale_claims()
+            while True:
+                batch = await self._flush_batch()
+                if not batch:
+                    break
+                written += batch
+
+        metrics.set_gauge("write_behind.transactions.depth", await self.depth())
+        metrics.set_gauge("write_behind.transactions.dead_letters", await self.dead_letter_depth())
+        return written
+
+    async def _requeue_stale_claims(self):
+        client = get_redis()
+        if client is None:
+            return
+
+        try:
+            requeue = client.register_script(REQUEUE_SCRIPT)
+            requeued = await requeue(
+                keys=[self.redis_key, self.claims_key],
+                args=["stale", time.time() - self.claim_timeout]
+            )
+            if requeued:
+                print(f"⚠️ Requeued {requeued} write-behind batches whose flusher never finished")
+        except Exception as e:
+            print(f"Error requeueing stale write-behind batches: {e}")
+
+    async def _flush_batch(self) -> int:
+        client = get_redis()
+        if client is not None:
+            batch_key = f"{self.claims_key}:{uuid.uuid4().hex}"
+            try:
+                claim = client.register_script(CLAIM_SCRIPT)
+                entries = await claim(
+                    keys=[self.redis_key, self.claims_key, batch_key],
+                    args=[self.batch_size, time.time()]
+                )
+            except Exception as e:
+                print(f"Error claiming write-behind batch: {e}")
+                entries = []
+
+            if entries:
+                dead = await self._write(entries)
+                try:
+                    if dead is None:
+                        requeue = client.register_script(REQUEUE_SCRIPT)
+                        await requeue(keys=[self.redis_key, self.claims_key], args=["batch", batch_key])
+                        return 0
+
+                    async with client.pipeline(transaction=True) as pipe:
+                        if dead:
+                            pipe.rpush(self.dead_letter_key, *dead)
+                        pipe.zrem(self.claims_key, batch_key)
+                        pipe.delete(batch_key)
+                        await pipe.execute()
+                except Exception as e:
+                    # The claim times out and is requeued; replaying the inserts is harmless
+                    print(f"Error acknowledging write-behind batch: {e}")
+                    return 0
+                return len(entries)
+
+        if not self._local:
+            return 0
+
+        entries = [self._local.popleft() for _ in range(min(self.batch_size, len(self._local)))]
+        dead = await self._write(entries)
+        if dead is None:
+            self._local.extendleft(reversed(entries))
+            return 0
+        self._dead_letters.extend(dead)
+        return len(entries)
+
+    async def _write(self, entries: List[str]) -> Optional[List[str]]:
+        """Insert a batch; returns the entries that can never be inserted, or None to retry the batch later"""
+        parsed: List[Tuple[str, Dict]] = []
+        dead: List[str] = []
+        for entry in entries:
+            try:
+                parsed.append((entry, self._parse(entry)))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Dead-lettering unreadable buffered transaction {entry!r}: {e}")
+                dead.append(entry)
+
+        try:
+            await self._insert([row for _, row in parsed])
+            return dead
+        except Exception as e:
+            print(f"Error flushing pending transactions, retrying one by one: {e}")
+
+        for entry, row in parsed:
+            try:
+                await self._insert([row])
+            except (IntegrityError, DataError) as e:
+                print(f"Dead-lettering buffered transaction {entry}: {e}")
+                dead.append(entry)
+            except Exception as e:
+                print(f"Error flushing pending transactions: {e}")
+                return None
+        return dead
+
+    @staticmethod
+    def _parse(entry: str) -> Dict:
+        row = json.loads(entry)
+        return {
+            "user_id": row["user_id"],
+            "transaction_id": row["transaction_id"],
+            "invoice_payload": row.get("invoice_payload"),
+            "amount": row["amount"],
+            "status": TransactionStatus.PENDING.value,
+            "created_at": datetime.fromisoformat(row["created_at"])
+        }
+
+    async def _insert(self, rows: List[Dict]):
+        if not rows:
+            return
+
+        with metrics.timer("write_behind.transactions.flush"):
+            async with async_session_maker() as session:
+                # A payment can settle before its pending row is flushed; that row would never complete
+                settled = await self._settled_invoices(session, rows)
+                rows = [row for row in rows if (row["user_id"], row["invoice_payload"]) not in settled]
+                if rows:
+                    await session.execute(
+                        dialect_insert(Transaction)
+                        .values(rows)
+                        .on_conflict_do_nothing(index_elements=[Transaction.transaction_id])
+                    )
+                    await session.commit()
+
+    @staticmethod
+    async def _settled_invoices(session: AsyncSession, rows: List[Dict]) -> Set[Tuple[int, str]]:
+        payloads = {row["invoice_payload"] for row in rows if row["invoice_payload"]}
+        if not payloads:
+            return set()
+
+        result = await session.execute(
+            select(Transaction.user_id, Transaction.invoice_payload)
+            .where(
+                Transaction.invoice_payload.in_(payloads),
+                Transaction.status == TransactionStatus.COMPLETED.value
+            )
+        )
+        return set(result.tuples().all())
+
+pending_transactions = PendingTransactionBuffer(
+    batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    claim_timeout=settings.WRITE_BEHIND_CLAIM_TIMEOUT
+)
@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+# app.core.database builds its engine at import time, so point it at a
+# throwaway SQLite file before any app module is imported
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.pop("REDIS_URL", None)
+
+import pytest
+from app.core.database import engine
+from app.models.database import Base
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def db(anyio_backend):
+    """Fresh tables for one test"""
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
@@ -0,0 +1,28 @@
+from app.core.database import async_session_maker
+from app.models.database import Gift
+from app.services.gift_counter import gift_win_counter
+from app.services.statistics import StatisticsService
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def test_top_gifts_include_unflushed_wins(db):
+    async with async_session_maker() as session:
+        common = Gift(gift_id="common", name="Common", star_count=10, win_probability=0.9, total_won=5)
+        rare = Gift(gift_id="rare", name="Rare", star_count=100, win_probability=0.1, total_won=4)
+        session.add_all([common, rare])
+        await session.commit()
+
+    gift_win_counter.record(rare.id, 3)
+    try:
+        async with async_session_maker() as session:
+            assert await StatisticsService(session).get_top_gifts() == [
+                {"name": "Rare", "count": 7},
+                {"name": "Common", "count": 5}
+            ]
+
+        assert await gift_win_counter.flush() == 3
+        async with async_session_maker() as session:
+            assert await gift_win_counter.get_totals(session) == {common.id: 5, rare.id: 7}
+    finally:
+        gift_win_counter._pending.clear()
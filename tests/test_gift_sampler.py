@@ -0,0 +1,105 @@
+from app.models.database import Gift
+from app.services.gift_inventory import GiftInventory, gift_inventory
+from app.services.gift_sampler import AliasTable, GiftSampler
+from collections import Counter
+import numpy as np
+import pytest
+import random
+
+pytestmark = pytest.mark.anyio
+
+WEIGHTS = [0.5, 0.25, 0.15, 0.07, 0.03]
+
+def make_gifts():
+    return [
+        Gift(id=i + 1, gift_id=f"gift_{i}", name=f"Gift {i}", star_count=10, win_probability=weight)
+        for i, weight in enumerate(WEIGHTS)
+    ]
+
+def test_alias_table_pick_covers_each_weight_exactly():
+    table = AliasTable(WEIGHTS)
+    grid = 100_000
+    picks = Counter(table.pick(i / grid) for i in range(grid))
+
+    for index, weight in enumerate(WEIGHTS):
+        assert picks[index] / grid == pytest.approx(weight, abs=1e-4)
+
+def test_alias_table_draw_matches_weights():
+    table = AliasTable(WEIGHTS)
+    rng = random.Random(42)
+    draws = 200_000
+    picks = Counter(table.draw(rng) for _ in range(draws))
+
+    for index, weight in enumerate(WEIGHTS):
+        assert picks[index] / draws == pytest.approx(weight, abs=0.005)
+
+def test_alias_table_draw_many_matches_weights():
+    table = AliasTable(WEIGHTS)
+    draws = table.draw_many(200_000, rng=np.random.default_rng(42))
+    frequencies = np.bincount(draws, minlength=len(WEIGHTS)) / len(draws)
+
+    for index, weight in enumerate(WEIGHTS):
+        assert frequencies[index] == pytest.approx(weight, abs=0.005)
+
+def test_alias_table_normalizes_weights():
+    assert AliasTable([2, 2]).prob == [1.0, 1.0]
+
+    with pytest.raises(ValueError):
+        AliasTable([0, 0])
+
+async def test_sampler_skips_gifts_without_weight():
+    sampler = GiftSampler()
+    gifts = make_gifts()
+    gifts[0].win_probability = 0
+    sampler.build(gifts)
+
+    won = {(await sampler.draw()).id for _ in range(2_000)}
+
+    assert gifts[0].id not in won
+    assert gifts[0].id not in [gift.id for gift in await sampler.get_gifts()]
+
+async def test_sampler_drops_gifts_that_run_out():
+    sampler = GiftSampler()
+    gifts = make_gifts()
+    gifts[0].stock = 2
+    sampler.build(gifts)
+
+    won = [gift.id for gift in await sampler.draw_many(2_000)]
+
+    assert won.count(gifts[0].id) == 2
+    assert gifts[0].id not in [gift.id for gift in await sampler.get_gifts()]
+
+async def test_sampler_with_its_own_inventory_leaves_shared_stock_alone():
+    shared_stock = dict(gift_inventory._available)
+    inventory = GiftInventory()
+    sampler = GiftSampler(ttl=float("inf"), inventory=inventory)
+    gifts = make_gifts()
+    gifts[0].stock = 2
+    sampler.build(gifts)
+
+    await sampler.draw_many(2_000)
+
+    assert not inventory.is_available(gifts[0].id)
+    assert gift_inventory._available == shared_stock
+
+async def test_sampler_seeded_draws_are_reproducible():
+    sampler = GiftSampler()
+    sampler.build(make_gifts())
+
+    first = await sampler.draw_seeded("seed", "nonce", 10)
+    second = await sampler.draw_seeded("seed", "nonce", 10)
+    other = await sampler.draw_seeded("other seed", "nonce", 10)
+
+    assert [gift.id for gift in first] == [gift.id for gift in second]
+    assert [gift.id for gift in first] != [gift.id for gift in other]
+
+def test_sampler_goes_stale_after_ttl_or_invalidate():
+    sampler = GiftSampler(ttl=0)
+    sampler.build(make_gifts())
+    assert sampler.is_stale
+
+    sampler = GiftSampler(ttl=float("inf"))
+    sampler.build(make_gifts())
+    assert not sampler.is_stale
+    sampler.invalidate()
+    assert sampler.is_stale
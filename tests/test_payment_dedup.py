@@ -0,0 +1,19 @@
+from app.services.payment_dedup import PaymentDeduplicator
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def test_remembers_settlements():
+    dedup = PaymentDeduplicator(maxsize=10)
+
+    assert await dedup.get("charge_1") is None
+    await dedup.remember("charge_1", {"transaction_id": 1})
+    assert await dedup.get("charge_1") == {"transaction_id": 1}
+
+def test_claims_each_charge_once_until_released():
+    dedup = PaymentDeduplicator(maxsize=10)
+
+    assert dedup.claim("charge_1")
+    assert not dedup.claim("charge_1")
+    dedup.release("charge_1")
+    assert dedup.claim("charge_1")
@@ -0,0 +1,117 @@
+from sqlalchemy import select, func
+from app.core.database import async_session_maker
+from app.models.database import User, Gift, Transaction, WonGift, GiftDelivery, SpinSession, TransactionStatus
+from app.services.gift_sampler import gift_sampler
+from app.services.payment import PaymentService, SoldOutError
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+USER_ID = 1001
+
+@pytest.fixture
+async def gift_id(db):
+    async with async_session_maker() as session:
+        session.add(User(id=1, telegram_id=USER_ID))
+        gift = Gift(gift_id="tg_gift", name="Gift", star_count=10, win_probability=1.0)
+        session.add(gift)
+        await session.commit()
+        return gift.id
+
+async def count(model, *where):
+    async with async_session_maker() as session:
+        return await session.scalar(select(func.count()).select_from(model).where(*where))
+
+async def test_settlement_is_idempotent_per_charge(gift_id):
+    async with async_session_maker() as session:
+        payment_service = PaymentService(session)
+        first = await payment_service.settle_spin_payment(USER_ID, "charge_1", 10, [gift_id])
+        second = await payment_service.settle_spin_payment(USER_ID, "charge_1", 10, [gift_id])
+
+    assert first is not None
+    assert second is None
+    assert await count(Transaction, Transaction.status == TransactionStatus.COMPLETED.value) == 1
+    assert await count(WonGift) == 1
+
+async def test_settlement_completes_a_pending_row_for_the_charge(gift_id):
+    async with async_session_maker() as session:
+        payment_service = PaymentService(session)
+        pending = await payment_service.create_transaction(USER_ID, 10, "charge_1")
+
+        settlement = await payment_service.settle_spin_payment(USER_ID, "charge_1", 10, [gift_id])
+
+    assert settlement["transaction_id"] == pending.id
+    async with async_session_maker() as session:
+        transaction = await session.get(Transaction, pending.id)
+    assert transaction.status == TransactionStatus.COMPLETED.value
+    assert await count(Transaction) == 1
+
+async def test_settlement_completes_the_pre_checkout_row_for_the_payload(gift_id):
+    async with async_session_maker() as session:
+        payment_service = PaymentService(session)
+        pending = await payment_service.create_transaction(USER_ID, 20, "pre_checkout_1", invoice_payload="session_1")
+        pending_id = pending.id
+
+        settlement = await payment_service.settle_spin_payment(
+            USER_ID, "charge_1", 20, [gift_id, gift_id], invoice_payload="session_1"
+        )
+        again = await payment_service.settle_spin_payment(
+            USER_ID, "charge_1", 20, [gift_id, gift_id], invoice_payload="session_1"
+        )
+
+    assert settlement["transaction_id"] == pending_id
+    assert again is None
+    async with async_session_maker() as session:
+        transaction = await session.get(Transaction, pending_id)
+    assert transaction.transaction_id == "charge_1"
+    assert transaction.status == TransactionStatus.COMPLETED.value
+    assert await count(Transaction) == 1
+    assert await count(WonGift) == 2
+    assert await count(GiftDelivery) == 2
+
+async def test_settlement_records_every_gift_of_a_pack(gift_id):
+    async with async_session_maker() as session:
+        settlement = await PaymentService(session).settle_spin_payment(
+            USER_ID, "charge_1", 50, [gift_id] * 5
+        )
+
+    assert len(settlement["won_gift_ids"]) == 5
+    assert await count(WonGift, WonGift.transaction_id == settlement["transaction_id"]) == 5
+
+async def test_spin_session_is_refused_when_every_gift_is_sold_out(db):
+    async with async_session_maker() as session:
+        session.add(User(id=1, telegram_id=USER_ID))
+        session.add(Gift(gift_id="tg_gift", name="Gift", star_count=10, win_probability=1.0, stock=0))
+        await session.commit()
+
+    gift_sampler.invalidate()
+    try:
+        async with async_session_maker() as session:
+            with pytest.raises(SoldOutError):
+                await PaymentService(session).create_spin_session(USER_ID)
+    finally:
+        gift_sampler.invalidate()
+
+    assert await count(SpinSession) == 0
+
+async def test_refund_takes_over_the_pre_checkout_row_and_blocks_settlement(gift_id):
+    async with async_session_maker() as session:
+        payment_service = PaymentService(session)
+        pending = await payment_service.create_transaction(USER_ID, 10, "pre_checkout_1", invoice_payload="session_1")
+        pending_id = pending.id
+
+        refunded = await payment_service.record_refund(USER_ID, "charge_1", 10, invoice_payload="session_1")
+        again = await payment_service.record_refund(USER_ID, "charge_1", 10, invoice_payload="session_1")
+        settlement = await payment_service.settle_spin_payment(
+            USER_ID, "charge_1", 10, [gift_id], invoice_payload="session_1"
+        )
+
+    assert refunded == pending_id
+    assert again is None
+    assert settlement is None
+    async with async_session_maker() as session:
+        transaction = await session.get(Transaction, pending_id)
+    assert transaction.transaction_id == "charge_1"
+    assert transaction.status == TransactionStatus.REFUNDED.value
+    assert await count(Transaction) == 1
+    assert await count(WonGift) == 0
@@ -0,0 +1,73 @@
+from app.core.database import async_session_maker
+from app.models.database import User, Gift, Transaction, WonGift, TransactionStatus
+from app.services.reconciliation import ReconciliationService, reconcile_payments
+from datetime import datetime, timedelta
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+USER_ID = 1001
+PENDING = TransactionStatus.PENDING.value
+COMPLETED = TransactionStatus.COMPLETED.value
+
+async def add_transactions(*rows):
+    """(charge id, invoice payload, status) rows for one user, in id order; returns their ids"""
+    created_at = datetime.utcnow() - timedelta(days=1)
+    async with async_session_maker() as session:
+        session.add(User(id=1, telegram_id=USER_ID))
+        gift = Gift(gift_id="tg_gift", name="Gift", star_count=10, win_probability=1.0)
+        session.add(gift)
+        await session.flush()
+
+        transactions = []
+        for charge_id, invoice_payload, status in rows:
+            transaction = Transaction(
+                user_id=USER_ID,
+                transaction_id=charge_id,
+                invoice_payload=invoice_payload,
+                amount=10,
+                status=status,
+                created_at=created_at,
+                completed_at=created_at + timedelta(minutes=1) if status == COMPLETED else None
+            )
+            session.add(transaction)
+            await session.flush()
+            if status == COMPLETED:
+                session.add(WonGift(user_id=USER_ID, gift_id=gift.id, transaction_id=transaction.id))
+            transactions.append(transaction.id)
+        await session.commit()
+        return transactions
+
+async def statuses(transaction_ids):
+    async with async_session_maker() as session:
+        return [(await session.get(Transaction, transaction_id)).status for transaction_id in transaction_ids]
+
+async def test_pending_row_paid_through_a_later_row_for_its_payload_is_kept(db):
+    ids = await add_transactions(("pre_checkout_1", "session_1", PENDING), ("charge_1", "session_1", COMPLETED))
+
+    report = await reconcile_payments(repair=True, stale_after=timedelta(minutes=5))
+
+    assert report.issues == {ReconciliationService.PENDING_WITH_COMPLETED_COUNTERPART: 1}
+    assert await statuses(ids) == [PENDING, COMPLETED]
+
+async def test_same_amount_paid_again_does_not_hide_a_stuck_row(db):
+    ids = await add_transactions(("pre_checkout_1", None, PENDING), ("charge_2", None, COMPLETED))
+
+    report = await reconcile_payments(repair=True, stale_after=timedelta(minutes=5))
+
+    assert report.issues == {ReconciliationService.STUCK_PENDING: 1}
+    assert await statuses(ids) == [TransactionStatus.FAILED.value, COMPLETED]
+
+async def test_completed_row_covers_only_the_pending_row_before_it(db):
+    ids = await add_transactions(
+        ("pre_checkout_1", "session_1", PENDING),
+        ("pre_checkout_2", "session_1", PENDING),
+        ("charge_1", "session_1", COMPLETED),
+        ("pre_checkout_3", "session_1", PENDING)
+    )
+
+    report = await reconcile_payments(repair=True, stale_after=timedelta(minutes=5))
+
+    assert report.samples[ReconciliationService.PENDING_WITH_COMPLETED_COUNTERPART] == [ids[1]]
+    assert report.samples[ReconciliationService.STUCK_PENDING] == [ids[0], ids[3]]
+    assert await statuses(ids) == [TransactionStatus.FAILED.value, PENDING, COMPLETED, TransactionStatus.FAILED.value]
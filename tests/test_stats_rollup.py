@@ -0,0 +1,68 @@
+from sqlalchemy import select
+from app.core.database import async_session_maker
+from app.models.database import User, Transaction, DailyUserStats, DailyRevenueStats, TransactionStatus
+from app.services.stats_rollup import StatsRollupService
+from datetime import date, datetime
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def history(db):
+    """Two users and a payment on Oct 1, one user on Oct 3"""
+    async with async_session_maker() as session:
+        session.add_all([
+            User(id=1, telegram_id=1, created_at=datetime(2026, 10, 1, 9)),
+            User(id=2, telegram_id=2, created_at=datetime(2026, 10, 1, 23, 59)),
+            User(id=3, telegram_id=3, created_at=datetime(2026, 10, 3, 0, 1))
+        ])
+        session.add(Transaction(
+            user_id=1,
+            transaction_id="charge_1",
+            amount=100,
+            status=TransactionStatus.COMPLETED.value,
+            completed_at=datetime(2026, 10, 1, 12)
+        ))
+        await session.commit()
+
+async def rollups(model):
+    async with async_session_maker() as session:
+        return (await session.execute(select(model).order_by(model.day))).scalars().all()
+
+async def test_first_run_backfills_from_the_oldest_row(history):
+    async with async_session_maker() as session:
+        rolled_up = await StatsRollupService(session).advance(until=date(2026, 10, 3))
+        watermark = await StatsRollupService(session).get_watermark()
+
+    assert rolled_up == 2
+    assert watermark == date(2026, 10, 3)
+    assert [(row.day, row.new_users) for row in await rollups(DailyUserStats)] == [
+        (date(2026, 10, 1), 2),
+        (date(2026, 10, 2), 0)
+    ]
+    assert [(row.day, row.revenue, row.transactions) for row in await rollups(DailyRevenueStats)] == [
+        (date(2026, 10, 1), 100, 1),
+        (date(2026, 10, 2), 0, 0)
+    ]
+
+async def test_watermark_only_moves_forward(history):
+    async with async_session_maker() as session:
+        rollup_service = StatsRollupService(session)
+        await rollup_service.advance(until=date(2026, 10, 2))
+
+        assert await rollup_service.advance(until=date(2026, 10, 2)) == 0
+        assert await rollup_service.advance(until=date(2026, 10, 1)) == 0
+        assert await rollup_service.get_watermark() == date(2026, 10, 2)
+
+        # Picks up where it stopped; the day at the watermark is still live
+        assert await rollup_service.advance(until=date(2026, 10, 4)) == 2
+        assert await rollup_service.get_watermark() == date(2026, 10, 4)
+
+    assert [row.new_users for row in await rollups(DailyUserStats)] == [2, 0, 1]
+
+async def test_empty_database_starts_at_until(db):
+    async with async_session_maker() as session:
+        rollup_service = StatsRollupService(session)
+
+        assert await rollup_service.advance(until=date(2026, 10, 17)) == 0
+        assert await rollup_service.get_watermark() == date(2026, 10, 17)
@@ -0,0 +1,39 @@
+import pytest
+from aiogram.types import User as TelegramUser
+from sqlalchemy import select, func
+from app.core.database import async_session_maker
+from app.models.database import User
+from app.services.user import UserService
+
+pytestmark = pytest.mark.anyio
+
+async def test_get_or_create_user_creates_then_updates(db):
+    async with async_session_maker() as session:
+        created = await UserService(session).get_or_create_user(
+            TelegramUser(id=42, is_bot=False, first_name="Ann", username="ann")
+        )
+
+    assert created.id is not None
+    assert created.username == "ann"
+
+    async with async_session_maker() as session:
+        updated = await UserService(session).get_or_create_user(
+            TelegramUser(id=42, is_bot=False, first_name="Ann", username="ann_new", is_premium=True)
+        )
+
+    assert updated.id == created.id
+    assert updated.username == "ann_new"
+    assert updated.is_premium is True
+
+    async with async_session_maker() as session:
+        assert await session.scalar(select(func.count(User.id))) == 1
+
+async def test_get_or_create_user_returns_unchanged_user(db):
+    telegram_user = TelegramUser(id=42, is_bot=False, first_name="Ann", username="ann")
+    async with async_session_maker() as session:
+        created = await UserService(session).get_or_create_user(telegram_user)
+    async with async_session_maker() as session:
+        again = await UserService(session).get_or_create_user(telegram_user)
+
+    assert again.id == created.id
+    assert again.username == "ann"
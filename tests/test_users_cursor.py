@@ -0,0 +1,16 @@
+import pytest
+from app.services.user import encode_cursor, decode_cursor
+from datetime import datetime
+
+def test_cursor_round_trip():
+    key = (datetime(2026, 10, 17, 12, 30, 45, 123456), 987654321)
+
+    cursor = encode_cursor(key)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == key
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "WzEsMiwzXQ", "WyJub3QgYSBkYXRlIiwgMV0"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)